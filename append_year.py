@@ -0,0 +1,85 @@
+import argparse
+import os
+import pandas as pd
+from trademap_io import read_trademap_file
+from trademap_io.config import BASE_DIR, ITALY_FILE, PARTNER_FILES, RSCA_FILE, STABLE_FILE, WORLD_FILE
+from trademap_io.hs6 import format_hs6
+from trademap_io.incremental import (
+    STATE_DIR, accumulated_stable, append_year, init_from_long, read_all_years,
+)
+from trademap_io.rca import value_matrix
+from trademap_io.tables import find_col, guess_year_value_cols
+
+# Year-append mode: a new TradeMap year only needs that year's RCA; the per-HS6
+# accumulators in rca_state/ then give the stable core without touching earlier years.
+#   python append_year.py --init          (once: seed rca_state/ from italy.py output)
+#   python append_year.py --year 2025     (each new year)
+
+def year_matrix(path: str, year: int):
+    df = read_trademap_file(path)
+    code_col = find_col(df.columns, ["product", "code"]) or find_col(df.columns, ["code"])
+    label_col = find_col(df.columns, ["product", "label"])
+    cols = guess_year_value_cols(df, [year])
+    if code_col is None or not cols:
+        raise ValueError(f"No code column or no {year} export-value column in {path}")
+    return value_matrix(df, code_col, label_col, cols)
+
+def ingest_year(dataset: str, year: int, italy_file: str, world_file: str):
+    # only the year=<year> partitions are written; earlier years stay as they are
+    from trademap_io.store import WORLD, write_frame
+    from trademap_io.tables import load_partner, load_reporter
+
+    write_frame(dataset, load_reporter(italy_file, [year]), "Italy", WORLD)
+    write_frame(dataset, load_reporter(world_file, [year]), WORLD, WORLD)
+    for partner, fname in PARTNER_FILES.items():
+        if os.path.exists(os.path.join(BASE_DIR, fname)):
+            write_frame(dataset, load_partner(partner, fname, BASE_DIR, [year]), "Italy", partner)
+            print("  ingested:", partner)
+
+def main():
+    parser = argparse.ArgumentParser(description="Append one TradeMap year to the RCA / stable-core state")
+    parser.add_argument("--year", type=int, help="year to compute and append")
+    parser.add_argument("--init", action="store_true", help="seed the state from the italy.py RSCA file")
+    parser.add_argument("--rsca-file", default=RSCA_FILE)
+    parser.add_argument("--italy-file", default=ITALY_FILE)
+    parser.add_argument("--world-file", default=WORLD_FILE)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--min-years", type=int, default=3)
+    parser.add_argument("--stable-out", default=STABLE_FILE)
+    parser.add_argument("--write-rsca", action="store_true",
+                        help="also rewrite --rsca-file from all stored years")
+    parser.add_argument("--dataset", help="also write this year's partitions into the Parquet store")
+    args = parser.parse_args()
+    if not args.init and args.year is None:
+        parser.error("give --year or --init")
+
+    print("APPEND_YEAR = START")
+
+    if args.init:
+        acc = init_from_long(args.state_dir, pd.read_csv(args.rsca_file, dtype={"hs6": str}))
+        print("Seeded years:", acc.years)
+    if args.year is not None:
+        acc = append_year(args.state_dir, args.year, year_matrix(args.italy_file, args.year),
+                          year_matrix(args.world_file, args.year))
+        print("Appended:", args.year)
+        if args.dataset:
+            ingest_year(args.dataset, args.year, args.italy_file, args.world_file)
+            print("Dataset updated:", args.dataset)
+
+    print("Stored years:", acc.years)
+
+    stable = accumulated_stable(acc, args.min_years)
+    stable.to_csv(args.stable_out, index=False)
+    print(f"Stable HS6 (RSCA > 0 in >= {args.min_years} years):", len(stable))
+    print("Saved:", args.stable_out)
+
+    if args.write_rsca:
+        full = read_all_years(args.state_dir)
+        full["hs6"] = format_hs6(full["hs6"])
+        full.to_csv(args.rsca_file, index=False)
+        print("Saved:", args.rsca_file)
+
+    print("DONE ✔")
+
+if __name__ == "__main__":
+    main()
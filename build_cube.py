@@ -0,0 +1,37 @@
+import argparse
+import os
+from trademap_io.config import BASE_DIR
+from trademap_io.cube import build_cube_from_store
+from trademap_io.sparse import build_sparse_from_store
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped partner x HS6 x year cube")
+    parser.add_argument("--dataset", default=os.path.join(BASE_DIR, "trademap_dataset"),
+                        help="Parquet store written by ingest_dataset.py")
+    parser.add_argument("--out", help="default: trademap_cube/ (or trademap_sparse.npz with --sparse)")
+    parser.add_argument("--partners", nargs="+", help="only these partners (default: all in the store)")
+    parser.add_argument("--float32", action="store_true", help="store values as float32 (half the size)")
+    parser.add_argument("--sparse", action="store_true",
+                        help="store only the non-zero cells (CSR rows per partner, one .npz)")
+    args = parser.parse_args()
+
+    print("BUILD_CUBE = START")
+    out = args.out or os.path.join(BASE_DIR, "trademap_sparse.npz" if args.sparse else "trademap_cube")
+    if args.sparse:
+        sv = build_sparse_from_store(args.dataset, args.partners)
+        sv.save(out)
+        print("DONE ✔")
+        print("Partners:", len(sv.partners), "| HS6:", len(sv.hs6), "| years:", len(sv.years))
+        print(f"Non-zero cells: {len(sv.value)} ({sv.density:.1%} of the dense cube)")
+        print("Saved:", out)
+        return
+
+    cube = build_cube_from_store(
+        args.dataset, out, args.partners, "float32" if args.float32 else "float64"
+    )
+    print("DONE ✔")
+    print("Shape (partners, hs6, years):", cube.values.shape, cube.values.dtype)
+    print("Saved:", out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import os
+from trademap_io.bundle import build_bundle, load_bundle
+from trademap_io.config import BASE_DIR
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the dashboard data bundle (Arrow tables + manifest)")
+    parser.add_argument("--base-dir", default=BASE_DIR, help="directory with the step1..step4 outputs")
+    parser.add_argument("--out", help="bundle directory (default: <base-dir>/dashboard_bundle)")
+    args = parser.parse_args()
+
+    print("BUILD_DASHBOARD_BUNDLE = START")
+    out = args.out or os.path.join(args.base_dir, "dashboard_bundle")
+    manifest = build_bundle(args.base_dir, out)
+    bundle = load_bundle(out)
+
+    print("DONE ✔")
+    for name in ("step1", "step2", "step3", "step4", "products"):
+        print(f"  {name}: {len(getattr(bundle, name))} rows")
+    print("Columns:", manifest["columns"])
+    print("KPIs:", manifest["kpis"])
+    print("Explorer partner filter:", "yes" if bundle.presence is not None else "no (no step2_presence_index.npz)")
+    print("Explorer value by year:", "yes" if bundle.values is not None else "no (no trademap_sparse.npz)")
+    print("Stability sliders:", "yes" if bundle.rsca is not None and bundle.values is not None else "no (needs the RSCA table and trademap_sparse.npz)")
+    print("Saved:", out)
+
+if __name__ == "__main__":
+    main()
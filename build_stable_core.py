@@ -0,0 +1,55 @@
+import argparse
+import os
+import pandas as pd
+from trademap_io.config import BASE_DIR, RSCA_FILE, STABLE_FILE, WINDOWS_FILE
+from trademap_io.stable import (
+    DEFAULT_MIN_YEARS, DEFAULT_THRESHOLD, GRID_MIN_YEARS, GRID_THRESHOLDS, WINDOWS,
+    stable_core, stable_grid, stable_stats, window_stability, write_grid,
+)
+
+# Stable core = HS6 with RSCA > threshold in >= min-years years (default: > 0 in >= 3),
+# from the italy.py output. --grid also writes one stable set per (threshold, min-years).
+# Windowed stability (max positive years in any w consecutive years, w = 3..12, longest
+# spell, entry / exit years) goes next to the RSCA file.
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the stable HS6 core from the RSCA table")
+    parser.add_argument("--rsca-file", default=RSCA_FILE, help="italy.py output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-years", type=int, default=DEFAULT_MIN_YEARS)
+    parser.add_argument("--out", default=STABLE_FILE)
+    parser.add_argument("--grid", action="store_true", help="also write the threshold x min-years sensitivity grid")
+    parser.add_argument("--grid-thresholds", nargs="+", type=float, default=GRID_THRESHOLDS)
+    parser.add_argument("--grid-min-years", nargs="+", type=int, default=GRID_MIN_YEARS)
+    parser.add_argument("--grid-dir", default=os.path.join(BASE_DIR, "stable_grid"))
+    parser.add_argument("--windows", nargs="+", type=int, default=WINDOWS, help="window lengths in years")
+    parser.add_argument("--windows-out", default=WINDOWS_FILE)
+    args = parser.parse_args()
+
+    print("BUILD_STABLE_CORE = START")
+
+    rsca = pd.read_csv(args.rsca_file, usecols=["year", "hs6", "product_label", "RSCA"], dtype={"hs6": str})
+    stats = stable_stats(rsca)
+    print("HS6 in RSCA table:", len(stats.hs6))
+    print("Years:", stats.years.min(), "-", stats.years.max())
+
+    core = stable_core(stats, args.threshold, args.min_years)
+    core.to_csv(args.out, index=False)
+    print(f"Stable HS6 (RSCA > {args.threshold} in >= {args.min_years} years):", len(core))
+    print("Saved:", args.out)
+
+    windows = window_stability(stats, args.windows, args.threshold)
+    windows.to_csv(args.windows_out, index=False)
+    print("Windowed stability columns:", [c for c in windows.columns if c.startswith("max_positive_in_")])
+    print("Saved:", args.windows_out)
+
+    if args.grid:
+        summary = write_grid(stable_grid(stats, args.grid_thresholds, args.grid_min_years), args.grid_dir)
+        print("\nGrid (stable HS6 count):")
+        print(summary.pivot(index="min_years", columns="threshold", values="stable_hs6").to_string())
+        print("Saved:", args.grid_dir)
+
+    print("DONE ✔")
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,44 @@
+import json
 import os
-import re
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from trademap_io.bundle import open_bundle, source_fingerprint
+from trademap_io.explorer import PAGE_SIZES, ProductExplorer
+from trademap_io.stable import DEFAULT_MIN_YEARS, DEFAULT_THRESHOLD
+from trademap_io.thresholds import ThresholdModel
 
 st.set_page_config(page_title="Italy Stable Export Advantage Dashboard", layout="wide")
 
-# ----------------------------
-# Helpers
-# ----------------------------
-def normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = [str(c).strip().replace("\ufeff", "") for c in df.columns]
-    return df
-
-def pick_partner_col(df: pd.DataFrame) -> str:
-    cols = [c for c in df.columns]
-    # common candidates
-    for cand in ["partner", "Partner", "country", "Country", "p", "name", "Name"]:
-        if cand in cols:
-            return cand
-    # fallback: any col containing 'partner' or 'country'
-    for c in cols:
-        lc = c.lower()
-        if "partner" in lc or "country" in lc:
-            return c
-    raise KeyError(f"No partner/country column found. Columns: {cols}")
-
-def safe_read_csv(path: str) -> pd.DataFrame:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Missing file: {path}")
-    df = pd.read_csv(path)
-    return normalize_cols(df)
-
-def ensure_partner(df: pd.DataFrame) -> pd.DataFrame:
-    df = normalize_cols(df)
-    pcol = pick_partner_col(df)
-    if pcol != "partner":
-        df = df.rename(columns={pcol: "partner"})
-    df["partner"] = df["partner"].astype(str).str.strip()
-    return df
-
-def pick_numeric_col(df: pd.DataFrame, candidates):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    # fallback: try contains
-    for c in df.columns:
-        lc = c.lower()
-        for pat in candidates:
-            if pat.lower() in lc:
-                return c
-    raise KeyError(f"None of {candidates} found in columns: {list(df.columns)}")
-
 # ----------------------------
 # Load data
 # ----------------------------
-@st.cache_data
-def load_data():
-    step1 = ensure_partner(safe_read_csv("step1_partner_value_share_stable.csv"))
-    step2 = safe_read_csv("step2_hs6_partner_frequency.csv")  # hs6-level, no partner needed
-    step3 = ensure_partner(safe_read_csv("step3_partner_weighted_rsca_coverage.csv"))
-    step4 = ensure_partner(safe_read_csv("step4_partner_clusters.csv"))
-    return step1, step2, step3, step4
+# One precomputed bundle (Arrow tables + manifest of resolved columns and KPIs,
+# see trademap_io/bundle.py), memory-mapped once per server and shared by every
+# session. The cache is keyed on the source files' size / mtime (checked on every
+# rerun), so when a step CSV is regenerated the next load rebuilds the bundle.
+BUNDLE_DIR = os.environ.get("TRADEMAP_BUNDLE", "dashboard_bundle")
+
+@st.cache_resource(max_entries=1)
+def load_data(sources_key: str):
+    return open_bundle(".", BUNDLE_DIR)
 
 try:
-    step1, step2, step3, step4 = load_data()
+    sources_key = json.dumps(source_fingerprint("."), sort_keys=True)
+    bundle = load_data(sources_key)
 except Exception as e:
     st.error("Dashboard failed to load data.")
     st.exception(e)
     st.stop()
 
+step1, step2, step3, step4 = bundle.step1, bundle.step2, bundle.step3, bundle.step4
+
 # ----------------------------
-# Column mapping (robust)
+# Column mapping (resolved when the bundle was built)
 # ----------------------------
-col_value_share = pick_numeric_col(step1, ["value_share_stable"])
-col_cov_ratio   = pick_numeric_col(step4, ["coverage_ratio"])
-col_weight_cov  = pick_numeric_col(step3, ["weighted_rsca_coverage"])
+col_value_share = bundle.manifest["columns"]["value_share"]
+col_cov_ratio   = bundle.manifest["columns"]["coverage_ratio"]
+col_weight_cov  = bundle.manifest["columns"]["weighted_rsca_coverage"]
+kpis = bundle.manifest["kpis"]
 
 # ----------------------------
 # Title & Intro
@@ -96,16 +58,16 @@ st.divider()
 # KPIs
 # ----------------------------
 k1, k2, k3 = st.columns(3)
-k1.metric("Stable HS6 products (core)", int(pd.read_csv("italy_hs6_stable_min3years_avg_rsca.csv").shape[0]))
-k2.metric("Partners analysed", int(step1["partner"].nunique()))
-k3.metric("Max weighted RSCA coverage", f"{step3[col_weight_cov].max():.2f}")
+k1.metric("Stable HS6 products (core)", kpis["stable_hs6"])
+k2.metric("Partners analysed", kpis["partners"])
+k3.metric("Max weighted RSCA coverage", f"{kpis['max_weighted_rsca_coverage']:.2f}")
 
 st.divider()
 
 # ----------------------------
 # Partner selector
 # ----------------------------
-partners = sorted(set(step1["partner"]).intersection(set(step3["partner"])).intersection(set(step4["partner"])))
+partners = bundle.manifest["partners"]
 if not partners:
     st.error("No common partner names across step1/step3/step4 files. Check partner naming consistency.")
     st.stop()
@@ -174,11 +136,7 @@ scatter = step4[["partner", col_cov_ratio]].merge(
     step3[["partner", col_weight_cov]], on="partner", how="left"
 )
 # add cluster if available
-cluster_col = None
-for cand in ["cluster", "Cluster"]:
-    if cand in step4.columns:
-        cluster_col = cand
-        break
+cluster_col = bundle.manifest["columns"]["cluster"]
 if cluster_col:
     scatter = scatter.merge(step4[["partner", cluster_col]], on="partner", how="left")
 
@@ -197,5 +155,73 @@ fig4.update_traces(textposition="top center")
 st.plotly_chart(fig4, use_container_width=True)
 st.markdown("**Key insight:** Partners separate into types—some absorb high-value stable exports, while others align more with Italy’s strongest structural advantages.")
 
+st.divider()
+
+st.subheader("5) HS6 explorer: stable products")
+# Filtering, sorting and paging run on the server over the bundle's product table
+# (trademap_io/explorer.py); only the visible page is sent to the browser.
+@st.cache_resource(max_entries=1)
+def load_explorer(sources_key: str):
+    return ProductExplorer(bundle.products, bundle.presence, bundle.values)
+
+explorer = load_explorer(sources_key)
+rsca_lo = float(bundle.products["avg_rsca"].min())
+rsca_hi = float(bundle.products["avg_rsca"].max())
+
+f1, f2, f3 = st.columns([1, 2, 3])
+prefix = f1.text_input("HS2 / HS4 / HS6 prefix", "", max_chars=6)
+rsca_range = f2.slider("Average RSCA", rsca_lo, rsca_hi, (rsca_lo, rsca_hi))
+sel_partners = f3.multiselect("Exported to partners", explorer.partners)
+f4, f5, f6, f7 = st.columns(4)
+mode = f4.radio("Partner match", ["all", "any"], horizontal=True, disabled=not sel_partners)
+sort = f5.selectbox("Sort by", explorer.sort_columns)
+ascending = f6.toggle("Ascending", value=sort == "hs6")
+page_size = f7.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+page = st.number_input("Page", min_value=1, value=1, step=1)
+try:
+    result = explorer.query(prefix, rsca_range, sel_partners, mode, sort, ascending, page - 1, page_size)
+except ValueError as e:
+    st.warning(str(e))
+else:
+    st.caption(
+        f"{result.total} products match • page {result.page + 1} of {result.pages}"
+        + (" • value by year summed over the selected partners" if sel_partners and bundle.values is not None else "")
+    )
+    st.dataframe(result.rows, use_container_width=True, hide_index=True)
+
+st.divider()
+
+st.subheader("6) What if the stability definition changes?")
+# Recomputed live from the bundle's HS6 x year RSCA matrix and the sparse value cube
+# (trademap_io/thresholds.py); each (threshold, min years) pair is computed once per server.
+if bundle.rsca is None or bundle.values is None:
+    st.info("Needs the RSCA table and trademap_sparse.npz (build_cube.py --sparse) in the bundle.")
+else:
+    @st.cache_resource(max_entries=1)
+    def load_thresholds(sources_key: str):
+        return ThresholdModel(bundle.rsca, bundle.values)
+
+    model = load_thresholds(sources_key)
+    s1, s2 = st.columns(2)
+    threshold = s1.slider("RSCA threshold (RSCA > t)", -0.5, 0.9, DEFAULT_THRESHOLD, step=0.05)
+    min_years = s2.slider("Minimum positive years", 1, len(model.years), DEFAULT_MIN_YEARS)
+    live = model.metrics(threshold, min_years)
+    st.caption(f"Stable HS6 under this definition: {int(live['stable_hs6'].iloc[0])}")
+
+    fig6 = px.bar(
+        live.melt(
+            id_vars="partner",
+            value_vars=["value_share_stable", "coverage_ratio", "weighted_rsca_coverage"],
+            var_name="metric",
+        ),
+        x="partner",
+        y="value",
+        color="metric",
+        barmode="group",
+        labels={"value": "Share"},
+    )
+    st.plotly_chart(fig6, use_container_width=True)
+
 st.divider()
 st.caption("Author: Mahsa Rajabi Nejad — Italy Stable RSCA Project")
@@ -1,23 +1,10 @@
 import os
-import pandas as pd
-from io import StringIO
+from trademap_io import read_trademap_table
+from trademap_io.config import BASE_DIR
 
-BASE_DIR = os.path.expanduser("~/Downloads/italy")
 FILE = os.path.join(BASE_DIR, "italy to germany.xls")
 
-def read_trademap_html(path):
-    for enc in ["utf-8", "latin-1", "cp1252"]:
-        try:
-            with open(path, "r", encoding=enc, errors="ignore") as f:
-                html = f.read()
-            tables = pd.read_html(StringIO(html))
-            if tables:
-                return max(tables, key=lambda x: x.shape[0])
-        except Exception:
-            continue
-    raise RuntimeError("Cannot parse html")
-
-df = read_trademap_html(FILE)
+df = read_trademap_table(FILE)
 
 print("SHAPE:", df.shape)
 print("\nCOLUMNS:")
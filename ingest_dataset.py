@@ -0,0 +1,60 @@
+import argparse
+import os
+from trademap_io.cli import add_jobs_argument
+from trademap_io.config import BASE_DIR, ITALY_FILE, PARTNER_FILES, WORLD_FILE
+from trademap_io.discover import discover_partners
+from trademap_io.parallel import map_in_order
+from trademap_io.store import WORLD, open_store, write_frame
+from trademap_io.tables import load_partner, load_reporter
+
+def ingest_one(kind: str, name: str, path: str, out: str) -> int:
+    print("Ingesting:", name)
+    if kind == "partner":
+        frame = load_partner(name, os.path.basename(path), os.path.dirname(path))
+        reporter, partner = "Italy", name
+    else:
+        frame = load_reporter(path)
+        reporter, partner = name, WORLD
+    write_frame(out, frame, reporter, partner)
+    return len(frame)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TradeMap .xls inputs into a partitioned Parquet dataset")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "trademap_dataset"), help="dataset root")
+    parser.add_argument("--italy-file", default=ITALY_FILE)
+    parser.add_argument("--world-file", default=WORLD_FILE)
+    parser.add_argument("--reporter-file", action="append", default=[], metavar="NAME=PATH",
+                        help="extra exporter's list of exported products (repeatable), e.g. Germany=de.xls")
+    parser.add_argument("--discover", action="store_true",
+                        help="ingest every partner file found in the data directory (by its header)")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    print("INGEST_DATASET = START")
+
+    candidates = [("reporter", "Italy", args.italy_file), ("reporter", WORLD, args.world_file)]
+    for item in args.reporter_file:
+        name, _, path = item.partition("=")
+        if not path:
+            parser.error(f"--reporter-file expects NAME=PATH, got {item!r}")
+        candidates.append(("reporter", name, path))
+    partner_files = discover_partners(BASE_DIR) if args.discover else PARTNER_FILES
+    candidates += [("partner", p, os.path.join(BASE_DIR, f)) for p, f in partner_files.items()]
+    jobs = []
+    for kind, name, path in candidates:
+        if not os.path.exists(path):
+            print("WARNING: missing", path)
+            continue
+        jobs.append((kind, name, path, args.out))
+
+    # each job writes its own reporter/partner partitions, so they can run in parallel
+    counts = map_in_order(ingest_one, jobs, args.jobs)
+
+    print("DONE ✔")
+    for (_, name, _, _), n in zip(jobs, counts):
+        print(f"  {name}: {n} HS6 rows")
+    print("Rows in dataset:", open_store(args.out).count_rows())
+    print("Saved:", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import os
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from trademap_io.config import BASE_DIR
+from trademap_io.hs6 import format_hs6
+from trademap_io.rca import multi_reporter_rca
+
+def main():
+    parser = argparse.ArgumentParser(description="RCA / RSCA for every reporter x HS6 x year in the Parquet store")
+    parser.add_argument("--dataset", default=os.path.join(BASE_DIR, "trademap_dataset"),
+                        help="Parquet store written by ingest_dataset.py (add exporters with --reporter-file)")
+    parser.add_argument("--reporters", nargs="+", help="only these reporters (default: all but World)")
+    parser.add_argument("--years", nargs="+", type=int, help="only these years")
+    parser.add_argument("--chunk", type=int, default=32, help="reporters per block (bounds memory)")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "rca_all_reporters.parquet"))
+    parser.add_argument("--csv", action="store_true", help="write CSV (zero-padded hs6) instead of Parquet")
+    args = parser.parse_args()
+
+    print("RCA_ALL_REPORTERS = START")
+    t0 = time.perf_counter()
+    out = os.path.splitext(args.out)[0] + ".csv" if args.csv else args.out
+
+    writer = None
+    rows = 0
+    for i, block in enumerate(multi_reporter_rca(args.dataset, args.reporters, args.years, args.chunk)):
+        if args.csv:
+            block["hs6"] = format_hs6(block["hs6"])
+            block.to_csv(out, index=False, mode="w" if i == 0 else "a", header=(i == 0))
+        else:
+            table = pa.Table.from_pandas(block, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+        rows += len(block)
+        print(f"  block {i + 1}: {block['reporter'].nunique()} reporters, {len(block)} rows")
+    if writer is not None:
+        writer.close()
+
+    print("DONE ✔")
+    print("Rows:", rows)
+    print(f"Time: {time.perf_counter() - t0:.1f}s")
+    print("Saved:", out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+from trademap_io.cli import add_dataset_arguments, add_jobs_argument
+from trademap_io.config import BASE_DIR, PARTNER_FILES, STABLE_FILE
+from trademap_io.metrics import DENSE_MATRIX_FILE, METRICS, load_stable, run_metrics, select_partners, write_outputs
+
+# One load of every partner file feeds all registered metrics:
+#   value_share              -> step1_partner_value_share_stable*.csv
+#   exported_presence        -> step2_*.csv
+#   weighted_rsca_coverage   -> step3_partner_weighted_rsca_coverage.csv
+#   coverage_ratio(_value_gt0) -> italy_stable_rsca_partner_coverage*.csv
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute all partner metrics in one pass")
+    parser.add_argument(
+        "--metrics", nargs="+", default=list(METRICS), choices=sorted(METRICS),
+        help="metrics to compute (default: all)",
+    )
+    add_jobs_argument(parser)
+    add_dataset_arguments(parser)
+    parser.add_argument("--dense-matrix", action="store_true",
+                        help=f"also write {DENSE_MATRIX_FILE} (one column per stable HS6)")
+    args = parser.parse_args()
+
+    print("RUN_METRICS = START")
+
+    stable = load_stable(STABLE_FILE)
+    print("Stable HS6 count:", len(stable.hs6))
+
+    outputs = run_metrics(
+        args.metrics, select_partners(PARTNER_FILES, args), stable, BASE_DIR,
+        args.jobs, args.dataset, args.years, args.cube,
+    )
+    if not args.dense_matrix:
+        outputs.pop(DENSE_MATRIX_FILE, None)
+
+    print("DONE ✔")
+    for path in write_outputs(outputs, BASE_DIR):
+        print("Saved:", path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+from trademap_io.cli import add_dataset_arguments, add_jobs_argument
+from trademap_io.config import BASE_DIR, PARTNER_FILES, STABLE_FILE
+from trademap_io.metrics import DENSE_MATRIX_FILE, METRICS, load_stable, select_partners, write_outputs
+from trademap_io.shards import SHARD_DIR, merge_shards, read_plan, run_shard, write_plan
+
+# Many partners in fixed-size shards, each computed on its own, then merged:
+#   python run_shards.py --discover --shard-size 25            plan, every shard, merge
+#   python run_shards.py --discover --shard-size 25 --plan-only
+#   python run_shards.py --shard 3                             one shard of the plan
+#   python run_shards.py --merge                               outputs from the saved shards
+
+def main():
+    parser = argparse.ArgumentParser(description="Partner metrics in independent shards, merged at the end")
+    parser.add_argument(
+        "--metrics", nargs="+", default=list(METRICS), choices=sorted(METRICS),
+        help="metrics to compute (default: all)",
+    )
+    parser.add_argument("--shard-size", type=int, default=25, help="partners per shard")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--plan-only", action="store_true", help="write the shard plan and stop")
+    parser.add_argument("--shard", type=int, help="compute only this shard of the saved plan")
+    parser.add_argument("--merge", action="store_true", help="only merge the saved shards")
+    parser.add_argument("--dense-matrix", action="store_true",
+                        help=f"also write {DENSE_MATRIX_FILE} (one column per stable HS6)")
+    add_jobs_argument(parser)
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    print("RUN_SHARDS = START")
+
+    stable = load_stable(STABLE_FILE)
+    print("Stable HS6 count:", len(stable.hs6))
+
+    if args.shard is None and not args.merge:
+        partner_files = select_partners(PARTNER_FILES, args)
+        plan = write_plan(args.shard_dir, args.metrics, partner_files, args.shard_size)
+        print(f"Partners: {len(partner_files)} | shards: {len(plan['shards'])} of <= {args.shard_size}")
+        if args.plan_only:
+            print("DONE ✔")
+            print("Saved:", args.shard_dir)
+            return
+        shards = range(len(plan["shards"]))
+    elif args.shard is not None:
+        shards = [args.shard]
+    else:
+        shards = []
+
+    for i in shards:
+        print(f"---- shard {i}")
+        path = run_shard(args.shard_dir, i, stable, BASE_DIR, args.jobs, args.dataset, args.years, args.cube)
+        print("Saved:", path)
+
+    if args.shard is not None:
+        print("DONE ✔")
+        return
+
+    outputs = merge_shards(args.shard_dir, stable)
+    if not args.dense_matrix:
+        outputs.pop(DENSE_MATRIX_FILE, None)
+
+    print("DONE ✔")
+    print("Shards merged:", len(read_plan(args.shard_dir)["shards"]))
+    for path in write_outputs(outputs, BASE_DIR):
+        print("Saved:", path)
+
+if __name__ == "__main__":
+    main()
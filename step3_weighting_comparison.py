@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+import pandas as pd
+from trademap_io.config import BASE_DIR, RSCA_FILE, STABLE_FILE
+from trademap_io.coverage import coverage_matrix, weighting_matrix
+from trademap_io.hs6 import isin_sorted
+from trademap_io.metrics import load_stable
+from trademap_io.presence import load_presence
+
+# Step 3 under many weightings at once: partner x HS6 presence (from step2) times an
+# HS6 x weightings matrix (avg / max RSCA, export value, years positive, bootstrap
+# resamples of the years) -> partner x weightings coverage in one product.
+
+PRESENCE_FILE = os.path.join(BASE_DIR, "step2_presence_index.npz")
+
+def main():
+    parser = argparse.ArgumentParser(description="Step 3: weighted coverage under several weighting schemes")
+    parser.add_argument("--presence", default=PRESENCE_FILE, help="step2 presence index (.npz) or binary matrix CSV")
+    parser.add_argument("--rsca-file", default=RSCA_FILE, help="italy.py output")
+    parser.add_argument("--bootstrap", type=int, default=0, help="bootstrap resamples of the years")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("STEP3_WEIGHTING_COMPARISON = START")
+    t0 = time.perf_counter()
+
+    if not os.path.exists(args.presence):
+        raise FileNotFoundError(f"Missing {args.presence}; run step2_common_hs.py first")
+    presence = load_presence(args.presence)
+    stable = load_stable(STABLE_FILE)
+    # weights and presence on the stable core's HS6 axis (the edges CSV only has the exported codes)
+    outside = len(presence.hs6) - int(isin_sorted(presence.hs6, stable.hs6).sum())
+    if outside:
+        print(f"WARNING: {outside} HS6 in {args.presence} are not in the stable core; ignored")
+    presence = presence.reindex(stable.hs6)
+    print("Partners:", len(presence.partners), "| stable HS6:", len(stable.hs6))
+
+    rsca = pd.read_csv(args.rsca_file, usecols=["year", "hs6", "x_italy", "RSCA"], dtype={"hs6": str})
+    weights = weighting_matrix(rsca, stable.hs6, stable.rsca, args.bootstrap, args.seed)
+    print("Weightings:", weights.shape[1])
+
+    cov = pd.DataFrame(
+        coverage_matrix(presence.dense(), weights.to_numpy()),
+        index=pd.Index(presence.partners, name="partner"), columns=weights.columns,
+    )
+
+    named = [c for c in weights.columns if not c.startswith("boot_")]
+    out = cov[named].copy()
+    if args.bootstrap:
+        boot = cov.drop(columns=named)
+        out["boot_mean"] = boot.mean(axis=1)
+        out["boot_p05"] = boot.quantile(0.05, axis=1)
+        out["boot_p95"] = boot.quantile(0.95, axis=1)
+    out = out.sort_values("avg_rsca", ascending=False)
+
+    out_file = os.path.join(BASE_DIR, "step3_partner_coverage_by_weighting.csv")
+    out.to_csv(out_file)
+    print("DONE ✔")
+    print(out.round(4).to_string())
+    print(f"Time: {time.perf_counter() - t0:.2f}s")
+    print("Saved:", out_file)
+    if args.bootstrap:
+        boot_file = os.path.join(BASE_DIR, "step3_partner_coverage_bootstrap.csv")
+        boot.to_csv(boot_file)
+        print("Saved:", boot_file)
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,272 @@
+import argparse
 import os
+from itertools import combinations
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
-
-print("STEP4_PARTNER_CLUSTERING = START")
-
-BASE_DIR = os.path.expanduser("~/Downloads/italy")
+from trademap_io.cli import add_jobs_argument
+from trademap_io.config import BASE_DIR, STABLE_FILE
+from trademap_io.hs6 import format_hs6, index_mask
 
 # ---- input files from previous steps
 STEP1_FILE = os.path.join(BASE_DIR, "step1_partner_value_share_stable.csv")
 STEP2_FILE = os.path.join(BASE_DIR, "italy_stable_rsca_partner_coverage.csv")
 STEP3_FILE = os.path.join(BASE_DIR, "step3_partner_weighted_rsca_coverage.csv")
+SPARSE_FILE = os.path.join(BASE_DIR, "trademap_sparse.npz")
+PRESENCE_FILE = os.path.join(BASE_DIR, "step2_presence_index.npz")
+SWEEP_DIR = os.path.join(BASE_DIR, "step4_sweep")
+
+FEATURES = ["coverage_ratio", "value_share_stable", "weighted_rsca_coverage"]
+
+def load_indicators():
+    """step1 / step2 / step3 summary indicators, one row per partner."""
+    # ---- load
+    s1 = pd.read_csv(STEP1_FILE)
+    s2 = pd.read_csv(STEP2_FILE)
+    s3 = pd.read_csv(STEP3_FILE)
+
+    # ---- harmonise column names
+    s1 = s1.rename(columns={
+        "partner": "partner",
+        "value_share_stable": "value_share_stable"
+    })[["partner", "value_share_stable"]]
+
+    s2 = s2.rename(columns={
+        "partner": "partner",
+        "coverage_ratio": "coverage_ratio"
+    })[["partner", "coverage_ratio"]]
+
+    s3 = s3.rename(columns={
+        "partner": "partner",
+        "weighted_rsca_coverage": "weighted_rsca_coverage"
+    })[["partner", "weighted_rsca_coverage"]]
+
+    # ---- merge
+    df = s1.merge(s2, on="partner").merge(s3, on="partner")
+
+    print("\nMerged indicators:")
+    print(df)
+    return df
+
+def indicator_clusters(k):
+    """Partners clustered on the step1 / step2 / step3 summary indicators."""
+    df = load_indicators()
+
+    # ---- features
+    X = df[FEATURES]
+
+    # ---- standardise
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # ---- clustering
+    kmeans = KMeans(n_clusters=k, random_state=42, n_init=20)
+    df["cluster"] = kmeans.fit_predict(X_scaled)
+
+    # ---- cluster centroids (for interpretation)
+    centroids = pd.DataFrame(
+        scaler.inverse_transform(kmeans.cluster_centers_),
+        columns=X.columns
+    )
+    centroids["cluster"] = centroids.index
+    return df, centroids, "partner"
+
+def load_profiles(args, kind, items):
+    """(CSR profiles, row ids, column names, id column, count column) from the sparse values file."""
+    from trademap_io.metrics import load_stable
+    from trademap_io.sparse import load_sparse
+
+    if not os.path.exists(args.sparse):
+        raise FileNotFoundError(f"Missing {args.sparse}; run build_cube.py --sparse first")
+    sv = load_sparse(args.sparse)
+    code_mask = index_mask(sv.hs6, load_stable(STABLE_FILE).hs6) if args.stable_only else None
+    hs6 = format_hs6(sv.hs6 if code_mask is None else sv.hs6[code_mask])
+
+    # ---- partner x HS6 profiles (transposed to cluster HS6 by their partners)
+    X = sv.profiles(kind, code_mask)
+    if items == "hs6":
+        X = X.T.tocsr()
+        ids, columns = hs6, list(sv.partners)
+        keep = np.diff(X.indptr) > 0  # codes no partner imports have no profile
+        X, ids = X[keep], ids[keep]
+        count_name = "partner_count"
+    else:
+        ids, columns = list(sv.partners), list(hs6)
+        count_name = "hs6_count"
+    print(f"Profiles: {X.shape[0]} {items} x {X.shape[1]} ({kind}, {X.nnz} non-zero)")
+    id_col = "partner" if items == "partners" else "hs6"
+    return X, ids, columns, id_col, count_name
+
+def profile_clusters(args):
+    """Partners (or HS6) clustered on full absorption profiles from the sparse values file."""
+    from trademap_io.clustering import cluster_profiles
+
+    X, ids, columns, id_col, count_name = load_profiles(args, args.profiles, args.items)
+    res = cluster_profiles(X, args.k, args.svd, args.batch_size)
+    if args.svd:
+        print(f"TruncatedSVD: {args.svd} components, explained variance {res.explained:.1%}")
+    print(f"MiniBatchKMeans inertia: {res.inertia:.4f}")
+
+    df = pd.DataFrame({id_col: ids, count_name: np.diff(X.indptr), "cluster": res.labels})
+    centroids = pd.DataFrame(res.centroids, columns=columns)
+    centroids["cluster"] = centroids.index
+    return df, centroids, id_col
+
+def similarity_clusters(args):
+    """Partners clustered hierarchically on all-pairs Jaccard (stable HS6 sets) or cosine (values)."""
+    from trademap_io.presence import load_presence
+    from trademap_io.similarity import cosine, hierarchical, jaccard
+
+    if args.similarity == "jaccard":
+        if not os.path.exists(PRESENCE_FILE):
+            raise FileNotFoundError(f"Missing {PRESENCE_FILE}; run step2_common_hs.py first")
+        presence = load_presence(PRESENCE_FILE)
+        partners, counts, count_name = presence.partners, presence.hs6_count(), "stable_hs6_exported"
+        sim = jaccard(presence)
+        print(f"Jaccard: {len(partners)} partners x {len(presence.hs6)} stable HS6")
+    else:
+        X, partners, _, _, count_name = load_profiles(args, "share", "partners")
+        counts = np.diff(X.indptr)
+        sim = cosine(X)
+
+    labels, z = hierarchical(sim, args.k, args.linkage)
+    df = pd.DataFrame({"partner": partners, count_name: counts, "cluster": labels})
+    sim_df = pd.DataFrame(sim, index=pd.Index(partners, name="partner"), columns=partners)
+    link = pd.DataFrame(z, columns=["left", "right", "distance", "size"]).astype(
+        {"left": int, "right": int, "size": int}
+    )
+    return df, sim_df, link
+
+def sweep(args):
+    """k x feature subsets x bootstrap resamples, fitted in parallel; scores and co-assignment."""
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.preprocessing import normalize
+    from trademap_io.clustering import run_sweep
+
+    # ---- the scaled matrix is built once and shared by every fit
+    if args.profiles:
+        X, ids, _, id_col, _ = load_profiles(args, args.profiles, args.items)
+        Z = normalize(X)
+        if args.svd and args.svd < min(X.shape):
+            Z = normalize(TruncatedSVD(n_components=args.svd, random_state=args.seed).fit_transform(Z))
+        subsets = {"profile": np.arange(Z.shape[1])}
+        algo = "minibatch"
+    else:
+        df = load_indicators()
+        ids, id_col = df["partner"].to_numpy(), "partner"
+        Z = StandardScaler().fit_transform(df[FEATURES])
+        # every subset of at least two indicators
+        subsets = {
+            "+".join(FEATURES[i] for i in cols): np.array(cols)
+            for r in range(len(FEATURES), 1, -1) for cols in combinations(range(len(FEATURES)), r)
+        }
+        algo = "kmeans"
+
+    ks = [k for k in args.ks if 1 < k < Z.shape[0]]
+    n_fits = len(ks) * len(subsets) * (args.bootstrap + 1)
+    print(f"Sweep: k={ks} x {len(subsets)} feature sets x {args.bootstrap} resamples ({args.resample}) "
+          f"+ full fits = {n_fits} fits, jobs={args.jobs}")
+    fits, summary, coassign = run_sweep(
+        Z, subsets, ks, args.bootstrap, args.jobs, args.seed, algo, args.resample
+    )
+
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+    fits_path = os.path.join(SWEEP_DIR, "step4_sweep_fits.csv")
+    summary_path = os.path.join(SWEEP_DIR, "step4_sweep_summary.csv")
+    fits.to_csv(fits_path, index=False)
+    summary.to_csv(summary_path, index=False)
+    paths = [fits_path, summary_path]
+    for (k, name), c in coassign.items():
+        path = os.path.join(SWEEP_DIR, f"coassign_k{k}_{name}.csv")
+        pd.DataFrame(c, index=pd.Index(ids, name=id_col), columns=ids).to_csv(path)
+        paths.append(path)
+
+    print("\nDONE ✔")
+    print("\nModel selection (over the resamples):")
+    print(summary.round(4).to_string(index=False))
+    if not coassign:
+        print(f"\nCo-assignment matrices skipped ({Z.shape[0]} rows)")
+    print("\nSaved:")
+    for path in paths:
+        print(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Step 4: partner clustering")
+    parser.add_argument("--k", type=int, default=3, help="number of clusters")
+    parser.add_argument("--profiles", choices=["presence", "share"],
+                        help="cluster full partner x HS6 profiles (presence or value share) "
+                             "instead of the three summary indicators")
+    parser.add_argument("--items", choices=["partners", "hs6"], default="partners",
+                        help="with --profiles: cluster partners, or HS6 by their partner profiles")
+    parser.add_argument("--svd", type=int, default=0, help="with --profiles: TruncatedSVD components (0 = none)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="MiniBatchKMeans batch size")
+    parser.add_argument("--sparse", default=SPARSE_FILE, help="sparse values file (build_cube.py --sparse)")
+    parser.add_argument("--stable-only", action="store_true", help="profiles over the stable HS6 only")
+    parser.add_argument("--similarity", choices=["jaccard", "cosine"],
+                        help="all-pairs partner similarity (Jaccard of stable HS6 sets from step2, or cosine "
+                             "of value vectors) and hierarchical clustering on it")
+    parser.add_argument("--linkage", choices=["average", "complete", "single", "weighted"], default="average",
+                        help="with --similarity: agglomerative linkage")
+    parser.add_argument("--sweep", action="store_true",
+                        help="model selection: fit every --ks x feature subset x --bootstrap resample")
+    parser.add_argument("--ks", nargs="+", type=int, default=[2, 3, 4, 5, 6], help="with --sweep: k values")
+    parser.add_argument("--bootstrap", type=int, default=50, help="with --sweep: resamples per k and feature set")
+    parser.add_argument("--resample", choices=["rows", "columns"], default="rows",
+                        help="with --sweep: resample the clustered items or their features (e.g. HS6 columns)")
+    parser.add_argument("--seed", type=int, default=42)
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    print("STEP4_PARTNER_CLUSTERING = START")
+
+    if args.sweep:
+        sweep(args)
+        return
+
+    if args.similarity:
+        df, sim_df, link = similarity_clusters(args)
+        paths = [os.path.join(BASE_DIR, f"step4_partner_{name}_{args.similarity}.csv")
+                 for name in ("hier_clusters", "similarity", "linkage")]
+        df.sort_values("cluster").to_csv(paths[0], index=False)
+        sim_df.to_csv(paths[1])
+        link.to_csv(paths[2], index=False)
+
+        print("\nDONE ✔")
+        print(f"\nClustered partners ({args.linkage} linkage on 1 - {args.similarity}):")
+        print(df.sort_values("cluster").to_string(index=False))
+        print("\nSimilarity:")
+        print(sim_df.iloc[:12, :12].round(3).to_string())
+        print("\nSaved:")
+        for path in paths:
+            print(path)
+        return
+
+    if args.profiles:
+        df, centroids, id_col = profile_clusters(args)
+        prefix = "step4_partner_profile" if args.items == "partners" else "step4_hs6_profile"
+        out_path = os.path.join(BASE_DIR, f"{prefix}_clusters.csv")
+        centroids_path = os.path.join(BASE_DIR, f"{prefix}_centroids.csv")
+    else:
+        df, centroids, id_col = indicator_clusters(args.k)
+        out_path = os.path.join(BASE_DIR, "step4_partner_clusters.csv")
+        centroids_path = os.path.join(BASE_DIR, "step4_cluster_centroids.csv")
+
+    # ---- save outputs
+    df_sorted = df.sort_values("cluster")
+    df_sorted.to_csv(out_path, index=False)
+    centroids.to_csv(centroids_path, index=False)
+
+    print("\nDONE ✔")
+    print("\nClustered partners:" if id_col == "partner" else "\nClustered HS6 (first rows):")
+    print(df_sorted.head(50).to_string(index=False))
+
+    print("\nCluster centroids (original scale):")
+    print(centroids.iloc[:, :12].to_string(index=False) if centroids.shape[1] > 12 else centroids.to_string(index=False))
 
-# ---- load
-s1 = pd.read_csv(STEP1_FILE)
-s2 = pd.read_csv(STEP2_FILE)
-s3 = pd.read_csv(STEP3_FILE)
-
-# ---- harmonise column names
-s1 = s1.rename(columns={
-    "partner": "partner",
-    "value_share_stable": "value_share_stable"
-})[["partner", "value_share_stable"]]
-
-s2 = s2.rename(columns={
-    "partner": "partner",
-    "coverage_ratio": "coverage_ratio"
-})[["partner", "coverage_ratio"]]
-
-s3 = s3.rename(columns={
-    "partner": "partner",
-    "weighted_rsca_coverage": "weighted_rsca_coverage"
-})[["partner", "weighted_rsca_coverage"]]
-
-# ---- merge
-df = s1.merge(s2, on="partner").merge(s3, on="partner")
-
-print("\nMerged indicators:")
-print(df)
-
-# ---- features
-X = df[[
-    "coverage_ratio",
-    "value_share_stable",
-    "weighted_rsca_coverage"
-]]
-
-# ---- standardise
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# ---- clustering
-kmeans = KMeans(n_clusters=3, random_state=42, n_init=20)
-df["cluster"] = kmeans.fit_predict(X_scaled)
-
-# ---- cluster centroids (for interpretation)
-centroids = pd.DataFrame(
-    scaler.inverse_transform(kmeans.cluster_centers_),
-    columns=X.columns
-)
-centroids["cluster"] = centroids.index
-
-# ---- save outputs
-out_path = os.path.join(BASE_DIR, "step4_partner_clusters.csv")
-centroids_path = os.path.join(BASE_DIR, "step4_cluster_centroids.csv")
-
-df_sorted = df.sort_values("cluster")
-df_sorted.to_csv(out_path, index=False)
-centroids.to_csv(centroids_path, index=False)
-
-print("\nDONE ✔")
-print("\nClustered partners:")
-print(df_sorted.to_string(index=False))
-
-print("\nCluster centroids (original scale):")
-print(centroids.to_string(index=False))
-
-print("\nSaved:")
-print(out_path)
-print(centroids_path)
+    print("\nSaved:")
+    print(out_path)
+    print(centroids_path)
 
+if __name__ == "__main__":
+    main()
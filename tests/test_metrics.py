@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from trademap_io.cube import build_cube_from_store
+from trademap_io.metrics import StableCore, compute_metrics, finalize_metrics
+from trademap_io.sparse import build_sparse_from_store, load_sparse
+from trademap_io.store import write_frame
+
+STABLE = StableCore(hs6=np.array([10110, 20220], dtype=np.uint32), rsca=np.array([0.5, 0.25]), total_rsca=0.75)
+PARTNERS = {"France": None, "Germany": None}
+
+
+def _store(root):
+    hs6 = np.array([10110, 20220, 30330], dtype=np.uint32)
+    labels = ["a", "b", "c"]
+    write_frame(root, pd.DataFrame({"hs6": hs6, "label": labels, 2013: [1.0, 2.0, 3.0],
+                                    2014: [4.0, 0.0, 6.0], 2015: [0.0, 8.0, 9.0]}), "Italy", "France")
+    # Germany's file has no 2013 column
+    write_frame(root, pd.DataFrame({"hs6": hs6, "label": labels,
+                                    2014: [1.0, 0.0, 1.0], 2015: [2.0, 2.0, 0.0]}), "Italy", "Germany")
+
+
+def _value_share(per_partner):
+    out = finalize_metrics(["value_share"], list(PARTNERS), per_partner, STABLE)
+    return (
+        out["step1_partner_value_share_stable.csv"].sort_values("partner").reset_index(drop=True),
+        out["step1_partner_value_share_stable_by_year.csv"].reset_index(drop=True),
+    )
+
+
+def test_cube_skips_years_a_partner_file_does_not_have(tmp_path):
+    root = str(tmp_path / "store")
+    _store(root)
+    cube = build_cube_from_store(root, str(tmp_path / "cube"))
+    assert cube.listed_years.tolist() == [[1, 1, 1], [0, 1, 1]]
+
+    expected = _value_share(compute_metrics(["value_share"], PARTNERS, STABLE, str(tmp_path), dataset=root))
+    got = _value_share(compute_metrics(["value_share"], PARTNERS, STABLE, str(tmp_path), cube=str(tmp_path / "cube")))
+
+    assert got[0].set_index("partner")["years_detected"].to_dict() == {"France": 3, "Germany": 2}
+    assert list(got[1].loc[got[1]["partner"] == "Germany", "year"]) == [2014, 2015]
+    pd.testing.assert_frame_equal(got[0], expected[0], check_dtype=False)
+    pd.testing.assert_frame_equal(got[1], expected[1], check_dtype=False)
+
+
+def test_sparse_skips_years_a_partner_file_does_not_have(tmp_path):
+    root = str(tmp_path / "store")
+    _store(root)
+    path = str(tmp_path / "sparse.npz")
+    build_sparse_from_store(root).save(path)
+    assert load_sparse(path).listed_years.tolist() == [[True, True, True], [False, True, True]]
+
+    expected = _value_share(compute_metrics(["value_share"], PARTNERS, STABLE, str(tmp_path), dataset=root))
+    got = _value_share(compute_metrics(["value_share"], PARTNERS, STABLE, str(tmp_path), cube=path))
+
+    assert got[0].set_index("partner")["years_detected"].to_dict() == {"France": 3, "Germany": 2}
+    pd.testing.assert_frame_equal(got[0], expected[0], check_dtype=False)
+    pd.testing.assert_frame_equal(got[1], expected[1], check_dtype=False)
@@ -0,0 +1,15 @@
+import numpy as np
+
+from trademap_io.presence import PresenceMatrix
+
+
+def test_reindex_onto_the_stable_axis():
+    # an edge list only knows the exported codes; the stable core also has 30330
+    edges = PresenceMatrix.from_codes(["France", "Germany"], np.array([10110, 20220], dtype=np.uint32),
+                                      [np.array([10110]), np.array([10110, 20220])])
+    core = np.array([10110, 20220, 30330], dtype=np.uint32)
+    aligned = edges.reindex(core)
+    assert list(aligned.hs6) == list(core)
+    assert aligned.dense().tolist() == [[True, False, False], [True, True, False]]
+    assert aligned.partner_count().tolist() == [2, 1, 0]
+    assert aligned.hs6_count().tolist() == [1, 2]
@@ -0,0 +1,39 @@
+import json
+
+from trademap_io.reader import read_trademap_table
+from trademap_io.sniff import _manifest_path, sniff_file
+
+
+def _write_html(path, labels, encoding):
+    rows = "".join(f"<tr><td>{i:06d}</td><td>{label}</td><td>{i}</td></tr>" for i, label in enumerate(labels, 1))
+    html = (
+        "<html><body><!--" + " " * 5000 + "-->"  # non-ASCII text only after the sniffed head
+        "<table><tr><th>Product code</th><th>Product label</th><th>Value in 2013</th></tr>"
+        + rows + "</table></body></html>"
+    )
+    path.write_bytes(html.encode(encoding))
+
+
+def test_undeclared_cp1252_html_is_not_read_as_utf8(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRADEMAP_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "italy_to_ivory_coast.xls"
+    labels = ["Côte d'Ivoire café", "Crème brûlée"]
+    _write_html(path, labels, "cp1252")
+
+    assert sniff_file(str(path))["encoding"] == "cp1252"
+    with open(_manifest_path(str(path)), encoding="utf-8") as f:
+        entry = json.load(f)
+    assert (entry["encoding"], entry["encoding_from"]) == ("cp1252", "guess")
+
+    df = read_trademap_table(str(path))
+    assert list(df["Product label"]) == labels
+
+
+def test_undeclared_utf8_html_stays_utf8(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRADEMAP_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "italy_to_ivory_coast.xls"
+    labels = ["Côte d'Ivoire café"]
+    _write_html(path, labels, "utf-8")
+
+    assert sniff_file(str(path))["encoding"] == "utf-8"
+    assert list(read_trademap_table(str(path))["Product label"]) == labels
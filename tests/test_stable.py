@@ -0,0 +1,14 @@
+from trademap_io.stable import grid_file_name
+
+
+def test_grid_file_name_keeps_decimals():
+    assert grid_file_name(0.0, 3) == "stable_rsca_gt0p0_min3years.csv"
+    assert grid_file_name(0.25, 3) != grid_file_name(0.3, 3)
+    assert grid_file_name(-0.1, 5) == "stable_rsca_gt-0p1_min5years.csv"
+
+
+def test_grid_file_name_scientific_and_whole_thresholds():
+    assert grid_file_name(1e-05, 3) == "stable_rsca_gt1e-05_min3years.csv"
+    assert grid_file_name(1, 3) == "stable_rsca_gt1p0_min3years.csv"
+    assert grid_file_name(1e20, 2) == "stable_rsca_gt1e+20_min2years.csv"
+
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from trademap_io.tables import guess_year_value_cols, header_year, load_partner, partner_value_cols, year_columns
+
+
+def test_header_year():
+    assert header_year("Italy's exports to Germany | Value in 2025") == 2025
+    assert header_year("Exported value in 2013") == 2013
+    assert header_year("Product code") is None
+    assert header_year("Value in 20131") is None
+
+
+def test_value_columns_follow_the_headers():
+    df = pd.DataFrame(columns=[
+        "Product code", "Product label",
+        "Italy's exports to Germany | Value in 2024", "Italy's exports to Germany | Value in 2025",
+    ])
+    assert sorted(partner_value_cols(df, "Germany")) == [2024, 2025]
+    assert sorted(partner_value_cols(df, "Germany", [2025])) == [2025]
+
+    world = pd.DataFrame(columns=["Code", "Exported value in 2024", "Exported value in 2025"])
+    assert guess_year_value_cols(world) == ["Exported value in 2024", "Exported value in 2025"]
+
+
+def test_load_partner_reads_an_appended_year(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRADEMAP_CACHE_DIR", str(tmp_path / "cache"))
+    top = "<tr><td>Product code</td><td>Product label</td>" + "<td>Italy's exports to Germany</td>" * 2 + "</tr>"
+    sub = "<tr><td></td><td></td><td>Value in 2024</td><td>Value in 2025</td></tr>"
+    rows = "<tr><td>'010121</td><td>Horses</td><td>1</td><td>2</td></tr>"
+    (tmp_path / "germany.xls").write_text(f"<html><body><table>{top}{sub}{rows}</table></body></html>")
+
+    frame = load_partner("Germany", "germany.xls", str(tmp_path))
+    assert year_columns(frame) == [2024, 2025]
+    assert frame[2025].tolist() == [2.0]
@@ -0,0 +1,19 @@
+from .cache import cached_table, clear_cache
+from .numbers import to_number, to_number_frame, to_number_series
+from .reader import parse_main_table, read_trademap_file, read_trademap_table
+from .sniff import sniff_file
+from .tables import (
+    find_hs_col, fix_header_two_rows, load_partner, normalize_hs6_series, partner_value_cols,
+)
+from .metrics import METRICS, load_stable, register_metric, run_metrics
+from .presence import PresenceIndex, load_presence
+from .sparse import SparseValues, load_sparse
+
+__all__ = [
+    "read_trademap_table", "read_trademap_file", "parse_main_table", "sniff_file",
+    "cached_table", "clear_cache",
+    "to_number", "to_number_series", "to_number_frame",
+    "normalize_hs6_series", "fix_header_two_rows", "find_hs_col", "partner_value_cols",
+    "load_partner", "METRICS", "register_metric", "load_stable", "run_metrics",
+    "PresenceIndex", "load_presence", "SparseValues", "load_sparse",
+]
@@ -0,0 +1,258 @@
+"""
+Precomputed data bundle for the dashboard.
+
+The dashboard used to parse four CSVs, re-clean their column names and
+guess the partner / metric columns on every cold start, and re-read the
+stable file on every rerun for one KPI. `build_bundle` does all of that
+once and writes
+
+    <bundle>/step1.arrow ... step4.arrow   Arrow IPC (Feather v2), uncompressed
+    <bundle>/products.arrow                stable HS6 product table for the explorer
+    <bundle>/presence.npz, values.npz      step2 presence bits and sparse values,
+                                           copied when they exist (partner filter,
+                                           value by year in the explorer)
+    <bundle>/rsca.npz                      HS6 x year RSCA matrix (stability sliders)
+    <bundle>/manifest.json                 resolved column names, common partners,
+                                           KPIs and the source files' size / mtime
+
+`load_bundle` memory-maps the Arrow files and converts them one block per
+column: numeric columns without nulls (and, with pandas' Arrow-backed
+strings, the text columns) stay views on the map instead of being copied
+into consolidated blocks. A bundle held by `st.cache_resource` is read
+once per server and shared by every session.
+`open_bundle` rebuilds it first when a source CSV has changed; callers that
+cache the bundle key the cache on `source_fingerprint`, so a regenerated
+source is picked up on the next load.
+"""
+import json
+import os
+import shutil
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .config import RSCA_FILE
+from .hs6 import encode_hs6, format_hs6, lookup
+from .presence import PresenceMatrix, load_presence
+from .sparse import SparseValues, load_sparse
+from .stable import StableStats, stable_stats, stats_from_matrix
+
+SOURCES = {
+    "step1": "step1_partner_value_share_stable.csv",
+    "step2": "step2_hs6_partner_frequency.csv",  # hs6-level, no partner column
+    "step3": "step3_partner_weighted_rsca_coverage.csv",
+    "step4": "step4_partner_clusters.csv",
+}
+STABLE_SOURCE = "italy_hs6_stable_min3years_avg_rsca.csv"
+PARTNER_TABLES = ("step1", "step3", "step4")
+# optional inputs of the HS6 explorer, copied into the bundle when present
+EXTRA_SOURCES = {
+    "presence.npz": "step2_presence_index.npz",
+    "values.npz": "trademap_sparse.npz",
+}
+RSCA_SOURCE = os.path.basename(RSCA_FILE)  # product labels, RSCA matrix
+
+
+class Bundle(NamedTuple):
+    step1: pd.DataFrame
+    step2: pd.DataFrame
+    step3: pd.DataFrame
+    step4: pd.DataFrame
+    products: pd.DataFrame
+    presence: PresenceMatrix | None
+    values: SparseValues | None
+    rsca: StableStats | None
+    manifest: dict
+
+
+# ---------------- column resolution (was in dashboard.py) ----------------
+def normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [str(c).strip().replace("\ufeff", "") for c in df.columns]
+    return df
+
+
+def pick_partner_col(df: pd.DataFrame) -> str:
+    cols = [c for c in df.columns]
+    # common candidates
+    for cand in ["partner", "Partner", "country", "Country", "p", "name", "Name"]:
+        if cand in cols:
+            return cand
+    # fallback: any col containing 'partner' or 'country'
+    for c in cols:
+        lc = c.lower()
+        if "partner" in lc or "country" in lc:
+            return c
+    raise KeyError(f"No partner/country column found. Columns: {cols}")
+
+
+def safe_read_csv(path: str, **kwargs) -> pd.DataFrame:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing file: {path}")
+    df = pd.read_csv(path, **kwargs)
+    return normalize_cols(df)
+
+
+def ensure_partner(df: pd.DataFrame) -> pd.DataFrame:
+    df = normalize_cols(df)
+    pcol = pick_partner_col(df)
+    if pcol != "partner":
+        df = df.rename(columns={pcol: "partner"})
+    df["partner"] = df["partner"].astype(str).str.strip()
+    return df
+
+
+def pick_numeric_col(df: pd.DataFrame, candidates):
+    for c in candidates:
+        if c in df.columns:
+            return c
+    # fallback: try contains
+    for c in df.columns:
+        lc = c.lower()
+        for pat in candidates:
+            if pat.lower() in lc:
+                return c
+    raise KeyError(f"None of {candidates} found in columns: {list(df.columns)}")
+
+
+# ---------------- build / load ----------------
+def source_fingerprint(source_dir: str) -> dict:
+    """{source file: [size, mtime_ns]} (None for a missing optional file); a few stat calls."""
+    out = {}
+    for fname in list(SOURCES.values()) + [STABLE_SOURCE]:
+        st = os.stat(os.path.join(source_dir, fname))
+        out[fname] = [st.st_size, st.st_mtime_ns]
+    for fname in list(EXTRA_SOURCES.values()) + [RSCA_SOURCE]:
+        path = os.path.join(source_dir, fname)
+        out[fname] = [os.stat(path).st_size, os.stat(path).st_mtime_ns] if os.path.exists(path) else None
+    return out
+
+
+def build_products(source_dir: str, step2: pd.DataFrame, rsca: StableStats = None) -> pd.DataFrame:
+    """
+    One row per stable HS6, sorted by code: code (uint32), hs6, product_label
+    (from the RSCA table, when given), avg_rsca, years_positive (when the
+    stable file has it) and partner_count (step2).
+    """
+    stable = safe_read_csv(os.path.join(source_dir, STABLE_SOURCE), dtype={"hs6": str})
+    products = pd.DataFrame({"code": encode_hs6(stable["hs6"])})
+    products["hs6"] = format_hs6(products["code"])
+
+    if rsca is not None:
+        pos, found = lookup(rsca.hs6, products["code"].to_numpy())
+        products["product_label"] = np.where(found, rsca.labels[np.minimum(pos, len(rsca.hs6) - 1)], None)
+    for col in ("avg_rsca", "years_positive"):
+        if col in stable.columns:
+            products[col] = stable[col].to_numpy()
+
+    counts = pd.Series(step2["partner_count"].to_numpy(), index=encode_hs6(step2["hs6"]))
+    products["partner_count"] = products["code"].map(counts).fillna(0).astype("int64")
+    return products.sort_values("code", kind="stable").reset_index(drop=True)
+
+
+def build_bundle(source_dir: str, out_dir: str) -> dict:
+    """Read and resolve the dashboard CSVs once; write the Arrow tables and the manifest."""
+    tables = {
+        name: safe_read_csv(os.path.join(source_dir, fname), dtype={"hs6": str})
+        for name, fname in SOURCES.items()
+    }
+    for name in PARTNER_TABLES:
+        tables[name] = ensure_partner(tables[name])
+
+    columns = {
+        "value_share": pick_numeric_col(tables["step1"], ["value_share_stable"]),
+        "coverage_ratio": pick_numeric_col(tables["step4"], ["coverage_ratio"]),
+        "weighted_rsca_coverage": pick_numeric_col(tables["step3"], ["weighted_rsca_coverage"]),
+        "cluster": next((c for c in ["cluster", "Cluster"] if c in tables["step4"].columns), None),
+    }
+    partners = sorted(
+        set(tables["step1"]["partner"]) & set(tables["step3"]["partner"]) & set(tables["step4"]["partner"])
+    )
+    stable_rows = len(pd.read_csv(os.path.join(source_dir, STABLE_SOURCE), usecols=[0]))
+    manifest = {
+        "sources": source_fingerprint(source_dir),
+        "columns": columns,
+        "partners": partners,
+        "kpis": {
+            "stable_hs6": int(stable_rows),
+            "partners": int(tables["step1"]["partner"].nunique()),
+            "max_weighted_rsca_coverage": float(tables["step3"][columns["weighted_rsca_coverage"]].max()),
+        },
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    rsca = None
+    if os.path.exists(os.path.join(source_dir, RSCA_SOURCE)):
+        rsca = stable_stats(safe_read_csv(
+            os.path.join(source_dir, RSCA_SOURCE), usecols=["year", "hs6", "product_label", "RSCA"],
+            dtype={"hs6": str},
+        ))
+    tables["products"] = build_products(source_dir, tables["step2"], rsca)
+    # every file is written under a temporary name and swapped in, so a bundle that is
+    # still memory-mapped by a running dashboard keeps reading the old files
+    for name, df in tables.items():
+        path = os.path.join(out_dir, f"{name}.arrow")
+        feather.write_feather(df, path + ".tmp", compression="uncompressed")
+        os.replace(path + ".tmp", path)
+    for name, fname in EXTRA_SOURCES.items():
+        path = os.path.join(out_dir, name)
+        if os.path.exists(os.path.join(source_dir, fname)):
+            shutil.copyfile(os.path.join(source_dir, fname), path + ".tmp")
+            os.replace(path + ".tmp", path)
+        elif os.path.exists(path):
+            os.remove(path)
+    rsca_path = os.path.join(out_dir, "rsca.npz")
+    if rsca is not None:
+        np.savez_compressed(rsca_path + ".tmp.npz", hs6=rsca.hs6, years=rsca.years, rsca=rsca.rsca)
+        os.replace(rsca_path + ".tmp.npz", rsca_path)
+    elif os.path.exists(rsca_path):
+        os.remove(rsca_path)
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def is_fresh(source_dir: str, out_dir: str) -> bool:
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest["sources"] == source_fingerprint(source_dir)
+    except (FileNotFoundError, ValueError, KeyError):
+        return False
+
+
+def load_bundle(out_dir: str) -> Bundle:
+    """Tables on the memory-mapped Arrow files plus the manifest (no CSV parsing)."""
+    with open(os.path.join(out_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    tables = {}
+    for name in list(SOURCES) + ["products"]:
+        # the map stays open for as long as the frames reference its buffers;
+        # split_blocks keeps each column on its own buffer (no consolidation copy)
+        source = pa.memory_map(os.path.join(out_dir, f"{name}.arrow"), "r")
+        tables[name] = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+    presence = os.path.join(out_dir, "presence.npz")
+    values = os.path.join(out_dir, "values.npz")
+    rsca = None
+    if os.path.exists(os.path.join(out_dir, "rsca.npz")):
+        with np.load(os.path.join(out_dir, "rsca.npz")) as z:
+            rsca = stats_from_matrix(z["hs6"], z["years"], z["rsca"])
+    return Bundle(
+        **tables,
+        presence=load_presence(presence) if os.path.exists(presence) else None,
+        values=load_sparse(values) if os.path.exists(values) else None,
+        rsca=rsca,
+        manifest=manifest,
+    )
+
+
+def open_bundle(source_dir: str, out_dir: str) -> Bundle:
+    """The bundle in out_dir, rebuilt from source_dir first if it is missing or stale."""
+    if not is_fresh(source_dir, out_dir):
+        build_bundle(source_dir, out_dir)
+    return load_bundle(out_dir)
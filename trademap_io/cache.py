@@ -0,0 +1,143 @@
+"""
+Content-addressed cache of parsed TradeMap tables.
+
+Entries are keyed by the SHA-256 of the source file bytes, the reader that
+produced them and PARSER_VERSION, and stored as Arrow IPC (Feather) files.
+A changed source file hashes to a new key, so stale entries are never read;
+they simply age out of the size-bounded LRU.
+
+Environment:
+    TRADEMAP_CACHE=0              disable the cache
+    TRADEMAP_CACHE_DIR            cache location (default ~/.cache/trademap_io)
+    TRADEMAP_CACHE_MAX_BYTES      size bound before LRU eviction (default 2 GiB)
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # cache becomes a no-op
+    pa = None
+
+PARSER_VERSION = "1"
+SUFFIX = ".feather"
+
+
+def cache_dir() -> str:
+    return os.environ.get("TRADEMAP_CACHE_DIR", os.path.expanduser("~/.cache/trademap_io"))
+
+
+def cache_enabled() -> bool:
+    return pa is not None and os.environ.get("TRADEMAP_CACHE", "1") != "0"
+
+
+def max_bytes() -> int:
+    return int(os.environ.get("TRADEMAP_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(path: str, reader: str) -> str:
+    h = hashlib.sha256()
+    h.update(file_digest(path).encode())
+    h.update(f"|{reader}|{PARSER_VERSION}".encode())
+    return h.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(cache_dir(), key + SUFFIX)
+
+
+def _load(key: str) -> pd.DataFrame | None:
+    path = _entry_path(key)
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (FileNotFoundError, OSError, pa.ArrowInvalid):
+        return None
+    try:
+        os.utime(path)  # LRU: a hit refreshes the entry (best effort on a read-only cache)
+    except OSError:
+        pass
+    names = json.loads(table.schema.metadata[b"trademap_columns"])
+    df = table.to_pandas()
+    df.columns = names
+    for c in range(df.shape[1]):
+        # text comes back as a string dtype with None/NA; the parsers give object + NaN
+        col = df.iloc[:, c]
+        if not pd.api.types.is_numeric_dtype(col.dtype):
+            col = col.astype(object)
+            df.isetitem(c, col.where(col.notna(), np.nan))
+    return df
+
+
+def _store(key: str, df: pd.DataFrame) -> None:
+    names = [c if isinstance(c, (int, str)) else str(c) for c in df.columns]
+    out = df.copy()
+    out.columns = [str(i) for i in range(out.shape[1])]
+    table = pa.Table.from_pandas(out, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[b"trademap_columns"] = json.dumps(names).encode()
+    table = table.replace_schema_metadata(meta)
+
+    os.makedirs(cache_dir(), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir(), suffix=".tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, _entry_path(key))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    evict(max_bytes())
+
+
+def evict(limit: int) -> int:
+    """Drop least recently used entries until the cache fits in `limit` bytes."""
+    try:
+        entries = [e for e in os.scandir(cache_dir()) if e.name.endswith(SUFFIX)]
+    except FileNotFoundError:
+        return 0
+    stats = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+    total = sum(s for _, s, _ in stats)
+    removed = 0
+    for _, size, path in stats:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear_cache() -> int:
+    return evict(0)
+
+
+def cached_table(path: str, reader: str, load_fn) -> pd.DataFrame:
+    """load_fn(path), served from the cache when the file content was seen before."""
+    if not cache_enabled():
+        return load_fn(path)
+    key = cache_key(path, reader)
+    df = _load(key)
+    if df is None:
+        df = load_fn(path)
+        try:
+            _store(key, df)
+        except (OSError, pa.ArrowException) as e:
+            print(f"WARNING: cache write skipped for {path}: {e}")
+    return df
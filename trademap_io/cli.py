@@ -0,0 +1,18 @@
+"""Command-line options shared by the pipeline scripts."""
+import argparse
+
+
+def add_jobs_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="partner files processed in parallel (0 = one per CPU core, default 1 = serial)",
+    )
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dataset", help="read from the partitioned Parquet store instead of raw .xls files")
+    parser.add_argument("--cube", help="compute from a memory-mapped value cube or a sparse .npz (see build_cube.py)")
+    parser.add_argument("--discover", action="store_true",
+                        help="find partner files in the data directory by their header instead of PARTNER_FILES")
+    parser.add_argument("--partners", nargs="+", help="only these partners (default: all)")
+    parser.add_argument("--years", nargs="+", type=int, help="only these years (default: all)")
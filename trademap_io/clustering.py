@@ -0,0 +1,158 @@
+"""
+Clustering on full absorption profiles.
+
+step4 originally clusters the partners on three summary indicators. Here
+the rows are whole profiles (partner x HS6 presence or value shares from
+the sparse values file, or their transpose to cluster HS6 by the
+partners that absorb them): thousands of mostly-zero columns. Rows are
+scaled to unit length (so k-means compares profile shapes, not partner
+size), optionally projected with TruncatedSVD, and clustered with
+MiniBatchKMeans, which works on the sparse matrix in small batches.
+Centroids are reported in the original profile space as the mean
+profile of each cluster's members.
+
+`run_sweep` is the model-selection side: every (k, feature subset,
+bootstrap resample) fit is one task on a process pool. The scaled feature
+matrix is built once and handed to each worker at start-up, every task
+draws from its own SeedSequence (so results do not depend on the number
+of workers) and each worker is limited to one BLAS / OpenMP thread, so
+the pool rather than the library spreads the fits over the cores.
+"""
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+from sklearn.preprocessing import normalize
+from threadpoolctl import threadpool_limits
+
+from .parallel import map_in_order, resolve_jobs
+
+COASSIGN_MAX_ROWS = 1000   # co-assignment matrices are rows x rows
+SILHOUETTE_SAMPLE = 2000   # silhouette on a sample above this many rows
+
+
+class ProfileClusters(NamedTuple):
+    labels: np.ndarray      # (rows,)
+    centroids: np.ndarray   # (k, columns) mean member profile
+    inertia: float          # k-means inertia in the clustered space
+    explained: float        # SVD explained variance ratio (1.0 without SVD)
+
+
+def cluster_profiles(X, k: int, components: int = None, batch_size: int = 1024, seed: int = 42,
+                     n_init: int = 3) -> ProfileClusters:
+    """MiniBatchKMeans on the rows of a (sparse) profile matrix, optionally after TruncatedSVD."""
+    X = sparse.csr_matrix(X, dtype=np.float64)
+    if not 1 <= k <= X.shape[0]:
+        raise ValueError(f"k={k} needs 1..{X.shape[0]} rows to cluster")
+    Z = normalize(X)
+    explained = 1.0
+    if components and components < min(X.shape):
+        svd = TruncatedSVD(n_components=components, random_state=seed)
+        Z = normalize(svd.fit_transform(Z))
+        explained = float(svd.explained_variance_ratio_.sum())
+
+    km = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, n_init=n_init, random_state=seed)
+    labels = km.fit_predict(Z)
+    return ProfileClusters(labels, cluster_means(X, labels, k), float(km.inertia_), explained)
+
+
+def cluster_means(X, labels: np.ndarray, k: int) -> np.ndarray:
+    """(k, columns) mean row per cluster, one sparse product."""
+    member = sparse.csr_matrix(
+        (np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(k, len(labels))
+    )
+    counts = np.maximum(np.bincount(labels, minlength=k), 1)
+    return np.asarray((member @ X).todense()) / counts[:, None]
+
+
+# ---------------- model selection sweep ----------------
+_SWEEP = {}
+
+
+def _init_sweep(Z, subsets: dict, algo: str, resample: str, threads):
+    # once per worker: the shared matrix (threads = 1 in a pool, None = library default)
+    _SWEEP.update(Z=Z, subsets=subsets, algo=algo, resample=resample, threads=threads)
+
+
+def _fit(k: int, subset: str, b: int, seed: int):
+    """(labels of every row, inertia, silhouette) for one task; b = -1 is the full-sample fit."""
+    Z, cols = _SWEEP["Z"], _SWEEP["subsets"][subset]
+    X = Z[:, cols]
+    ss = np.random.SeedSequence([seed, k, list(_SWEEP["subsets"]).index(subset), b + 1])
+    rng = np.random.default_rng(ss)
+    fit_rows = np.arange(X.shape[0])
+    if b >= 0 and _SWEEP["resample"] == "columns":
+        X = X[:, rng.integers(0, X.shape[1], X.shape[1])]
+    elif b >= 0:
+        fit_rows = rng.integers(0, X.shape[0], X.shape[0])
+    fit_X = X[fit_rows]
+
+    state = int(ss.generate_state(1)[0])
+    if _SWEEP["algo"] == "kmeans":
+        km = KMeans(n_clusters=k, n_init=20, random_state=state)
+    else:
+        km = MiniBatchKMeans(n_clusters=k, n_init=3, batch_size=1024, random_state=state)
+    with threadpool_limits(_SWEEP["threads"]), warnings.catch_warnings():
+        # resamples with repeated rows can have fewer distinct points than k
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        km.fit(fit_X)
+        sil = np.nan
+        if 1 < len(np.unique(km.labels_)) < fit_X.shape[0]:
+            sample = SILHOUETTE_SAMPLE if fit_X.shape[0] > SILHOUETTE_SAMPLE else None
+            sil = float(silhouette_score(fit_X, km.labels_, sample_size=sample, random_state=state))
+        return km.predict(X), float(km.inertia_), sil
+
+
+def run_sweep(Z, subsets: dict, ks, bootstrap: int, jobs: int = 1, seed: int = 42,
+              algo: str = "kmeans", resample: str = "rows"):
+    """
+    Fit every k x feature subset on the full sample and on `bootstrap`
+    resamples (of the rows, or of the columns with resample="columns").
+
+    Z        scaled (rows, features) matrix, dense or CSR
+    subsets  {name: column positions in Z}
+    Returns (fits, summary, coassign):
+      fits      one row per fit: k, features, boot (-1 = full sample), inertia,
+                silhouette, ari_vs_full (agreement of the labels with the full fit)
+      summary   one row per k x features: means / spread over the resamples
+      coassign  {(k, features): (rows, rows) share of fits putting two rows together},
+                only when there are at most COASSIGN_MAX_ROWS rows
+    """
+    tasks = [(k, name, b, seed) for k in ks for name in subsets for b in range(-1, bootstrap)]
+    threads = 1 if resolve_jobs(jobs) > 1 else None
+    results = map_in_order(_fit, tasks, jobs, _init_sweep, (Z, subsets, algo, resample, threads))
+
+    n = Z.shape[0]
+    rows, coassign, full = [], {}, {}
+    for (k, name, b, _), (labels, inertia, sil) in zip(tasks, results):
+        if b < 0:
+            full[k, name] = labels
+        if n <= COASSIGN_MAX_ROWS:
+            onehot = np.eye(k, dtype=np.float32)[labels]
+            coassign[k, name] = coassign.get((k, name), 0) + onehot @ onehot.T
+        rows.append({
+            "k": k, "features": name, "boot": b, "inertia": inertia, "silhouette": sil,
+            "ari_vs_full": adjusted_rand_score(full[k, name], labels),
+        })
+    coassign = {key: c / (bootstrap + 1) for key, c in coassign.items()}
+
+    fits = pd.DataFrame(rows)
+    boots = fits[fits["boot"] >= 0] if bootstrap else fits
+    summary = boots.groupby(["k", "features"], sort=False).agg(
+        fits=("boot", "size"),
+        silhouette_mean=("silhouette", "mean"),
+        silhouette_std=("silhouette", "std"),
+        inertia_mean=("inertia", "mean"),
+        stability_ari=("ari_vs_full", "mean"),
+    ).reset_index()
+    full_fit = fits[fits["boot"] < 0].set_index(["k", "features"])
+    summary["silhouette_full"] = full_fit["silhouette"].reindex(
+        pd.MultiIndex.from_frame(summary[["k", "features"]])
+    ).to_numpy()
+    return fits, summary, coassign
@@ -0,0 +1,36 @@
+"""Shared paths and the partner list used by every stage."""
+import os
+
+BASE_DIR = os.path.expanduser("~/Downloads/italy")
+
+# Italy and world "list of exported products" tables (italy.py inputs)
+ITALY_FILE = os.path.join(
+    BASE_DIR, "Trade_Map_-_List_of_exported_products_for_the_selected_product_(All_products).xls"
+)
+WORLD_FILE = os.path.join(BASE_DIR, "6 digit export.xls")
+
+# italy.py output (RCA / RSCA per year and HS6)
+RSCA_FILE = os.path.join(BASE_DIR, "italy_hs6_rca_rsca_2013_2024.csv")
+# windowed stability per HS6 (build_stable_core.py)
+WINDOWS_FILE = os.path.join(BASE_DIR, "italy_hs6_rsca_windows_2013_2024.csv")
+
+# stable file from the RSCA step (HS6 with RSCA > 0 in >= 3 years), see build_stable_core.py
+STABLE_FILE = os.path.join(BASE_DIR, "italy_hs6_stable_min3years_avg_rsca.csv")
+
+PARTNER_FILES = {
+    "Germany": "italy to germany.xls",
+    "France": "italy to france.xls",
+    "Spain": "italy to spain.xls",
+    "Switzerland": "italy to switzerland.xls",
+    "Poland": "italy to poland.xls",
+    "Belgium": "_Italy_and_Belgium.xls",
+    "Netherlands": "Italy_and_Netherlands.xls",
+    "Austria": "Italy_and_Austria.xls",
+    "Romania": "Italy_and_Romania.xls",
+    "Czech Republic": "Italy_and_Czech_Republic .xls",
+}
+
+# years of the original download; readers take the years from the file headers
+# (tables.header_year) and the store partitions, so appended years are included
+YEAR_MIN, YEAR_MAX = 2013, 2024
+YEARS = list(range(YEAR_MIN, YEAR_MAX + 1))
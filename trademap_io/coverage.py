@@ -0,0 +1,92 @@
+"""
+Weighted coverage as one matrix product.
+
+With P the partner x HS6 presence matrix (1 = exported, value > 0 in any
+year) and W an HS6 x weightings matrix (one column per weighting scheme),
+
+    coverage = (P @ W) / W.sum(axis=0)        partners x weightings
+
+so step3's avg-RSCA coverage and any number of alternative weightings
+(max RSCA, export value, years positive, bootstrap-resampled average
+RSCA, ...) come out of the same product. P goes through scipy.sparse
+when it is sparse enough for that to pay off; without scipy the product
+is dense.
+"""
+import numpy as np
+import pandas as pd
+
+from .hs6 import encode_hs6, lookup
+
+try:
+    from scipy import sparse
+except ImportError:  # dense products only
+    sparse = None
+
+SPARSE_DENSITY = 0.25  # use a CSR product below this share of ones
+BOOT_BLOCK = 256       # bootstrap resamples materialised together (hs6 x block x years)
+
+
+def coverage_sums(present: np.ndarray, weights: np.ndarray, use_sparse=None) -> np.ndarray:
+    """(partners, hs6) presence @ (hs6, weightings) weights."""
+    present = np.asarray(present)
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    if use_sparse is None:
+        use_sparse = sparse is not None and present.size > 0 and np.count_nonzero(present) / present.size < SPARSE_DENSITY
+    if use_sparse:
+        return np.asarray(sparse.csr_matrix(present, dtype=np.float64) @ weights)
+    return present.astype(np.float64) @ weights
+
+
+def coverage_matrix(present: np.ndarray, weights: np.ndarray, use_sparse=None) -> np.ndarray:
+    """Weighted coverage share per partner and weighting (column sums of `weights` = 1.0)."""
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    return coverage_sums(present, weights, use_sparse) / weights.sum(axis=0)
+
+
+def weighting_matrix(rsca_long: pd.DataFrame, hs6: np.ndarray, avg_rsca=None, bootstrap: int = 0,
+                     seed: int = 0) -> pd.DataFrame:
+    """
+    HS6 x weightings on the sorted `hs6` index, from the italy.py long table:
+      avg_rsca        the stable file's weights if given, else the mean RSCA over the years
+      max_rsca        highest yearly RSCA
+      export_value    Italy's export value summed over the years
+      years_positive  years with RSCA > 0
+      boot_<b>        mean RSCA over a bootstrap resample of the years (b = 0 .. bootstrap-1)
+    Codes missing from the long table get weight 0.
+    """
+    codes = encode_hs6(rsca_long["hs6"])
+    pos, found = lookup(hs6, codes)
+    years, col = np.unique(rsca_long["year"].to_numpy(dtype=np.int64), return_inverse=True)
+
+    rsca = np.full((len(hs6), len(years)), np.nan)
+    rsca[pos[found], col[found]] = rsca_long["RSCA"].to_numpy(dtype=np.float64)[found]
+    value = np.zeros(len(hs6))
+    np.add.at(value, pos[found], rsca_long["x_italy"].to_numpy(dtype=np.float64)[found])
+    listed = ~np.isnan(rsca).all(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        filled = np.where(listed[:, None], rsca, 0.0)  # all-NaN rows would warn in nanmean/nanmax
+        mean_rsca = np.where(listed, np.nanmean(filled, axis=1), 0.0)
+        columns = {
+            "avg_rsca": np.asarray(avg_rsca, dtype=np.float64) if avg_rsca is not None else mean_rsca,
+            "max_rsca": np.where(listed, np.nanmax(filled, axis=1), 0.0),
+            "export_value": value,
+            "years_positive": (rsca > 0).sum(axis=1).astype(np.float64),
+        }
+    blocks = [np.column_stack(list(columns.values()))]
+    names = list(columns)
+
+    # (bootstrap, years) resampled year indices -> (hs6, bootstrap) means, BOOT_BLOCK at a time
+    draws = np.random.default_rng(seed).integers(0, len(years), size=(bootstrap, len(years)))
+    present = ~np.isnan(rsca)
+    filled = np.nan_to_num(rsca)
+    for start in range(0, bootstrap, BOOT_BLOCK):
+        d = draws[start:start + BOOT_BLOCK]
+        n = present[:, d].sum(axis=2)
+        blocks.append(np.where(n > 0, filled[:, d].sum(axis=2) / np.maximum(n, 1), 0.0))
+    names += [f"boot_{b}" for b in range(bootstrap)]
+    return pd.DataFrame(np.hstack(blocks), index=hs6, columns=names)
@@ -0,0 +1,100 @@
+"""
+Memory-mapped partner x HS6 x year value cube.
+
+On disk a cube is a directory with
+    values.dat        raw (partners, hs6, years) array, C order, float64 or float32
+    listed.dat        (partners, hs6) uint8, 1 where the code appears in the partner file
+    listed_years.dat  (partners, years) uint8, 1 where the partner file has that year
+    hs6.npy           sorted HS6 codes (uint32), the index of axis 1
+    years.npy         years (int16), the index of axis 2
+    meta.json         shape, dtype and partner names (axis 0)
+`open_cube` maps the arrays read-only without copying, so opening a cube
+for hundreds of partners costs a few small reads and a step only pages in
+the slices its reductions touch.
+"""
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Cube(NamedTuple):
+    values: np.ndarray    # (partners, hs6, years)
+    listed: np.ndarray    # (partners, hs6)
+    hs6: np.ndarray       # sorted uint32 codes
+    years: np.ndarray
+    partners: list
+    listed_years: np.ndarray  # (partners, years)
+
+    def partner_index(self, partner: str) -> int:
+        return self.partners.index(partner)
+
+
+def create_cube(path: str, hs6, partners: list, years, dtype="float64") -> Cube:
+    hs6 = np.unique(np.asarray(hs6, dtype=np.uint32))
+    years = np.asarray(years, dtype=np.int16)
+    shape = (len(partners), len(hs6), len(years))
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "hs6.npy"), hs6)
+    np.save(os.path.join(path, "years.npy"), years)
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"shape": shape, "dtype": np.dtype(dtype).name, "partners": list(partners)}, f, indent=2)
+    values = np.memmap(os.path.join(path, "values.dat"), dtype=dtype, mode="w+", shape=shape)
+    listed = np.memmap(os.path.join(path, "listed.dat"), dtype=np.uint8, mode="w+", shape=shape[:2])
+    listed_years = np.memmap(
+        os.path.join(path, "listed_years.dat"), dtype=np.uint8, mode="w+", shape=(shape[0], shape[2])
+    )
+    return Cube(values, listed, hs6, years, list(partners), listed_years)
+
+
+def open_cube(path: str, mode: str = "r") -> Cube:
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    shape = tuple(meta["shape"])
+    listed_years = os.path.join(path, "listed_years.dat")
+    return Cube(
+        values=np.memmap(os.path.join(path, "values.dat"), dtype=meta["dtype"], mode=mode, shape=shape),
+        listed=np.memmap(os.path.join(path, "listed.dat"), dtype=np.uint8, mode=mode, shape=shape[:2]),
+        hs6=np.load(os.path.join(path, "hs6.npy"), mmap_mode="r"),
+        years=np.load(os.path.join(path, "years.npy")),
+        partners=meta["partners"],
+        # cubes built before listed_years.dat: every partner has every year
+        listed_years=(
+            np.memmap(listed_years, dtype=np.uint8, mode=mode, shape=(shape[0], shape[2]))
+            if os.path.exists(listed_years) else np.ones((shape[0], shape[2]), dtype=np.uint8)
+        ),
+    )
+
+
+def build_cube_from_store(root: str, out: str, partners=None, dtype="float64", years=None) -> Cube:
+    """
+    Fill a cube from the Parquet store (reporter=Italy), one partner at a time.
+    The year axis is every year partition stored for the partners (so years added
+    with append_year.py are included) unless `years` is given.
+    """
+    from .store import list_partners, list_years, open_store, read_long
+
+    store = open_store(root)
+    partners = partners or list_partners(store)
+    years = years or list_years(store, "Italy", partners)
+    # a code may first appear in a later year: index the codes of every year partition
+    codes = [
+        read_long(store, "Italy", p, years=years, columns=["hs6"])["hs6"].to_numpy()
+        for p in partners
+    ]
+    cube = create_cube(out, np.concatenate(codes) if codes else [], partners, years, dtype)
+
+    for i, p in enumerate(partners):
+        long = read_long(store, "Italy", p, years=years, columns=["hs6", "year", "value"])
+        h = np.searchsorted(cube.hs6, long["hs6"].to_numpy(dtype=np.uint32))
+        y = np.searchsorted(cube.years, long["year"].to_numpy(dtype=np.int16))
+        block = np.zeros(cube.values.shape[1:], dtype=np.float64)
+        np.add.at(block, (h, y), long["value"].to_numpy())
+        cube.values[i] = block
+        cube.listed[i, h] = 1
+        cube.listed_years[i, np.unique(y)] = 1
+    cube.values.flush()
+    cube.listed.flush()
+    cube.listed_years.flush()
+    return open_cube(out)
@@ -0,0 +1,80 @@
+"""
+Partner discovery from the files in a data directory.
+
+Every "Italy -> partner" download carries its partner in the table header
+("Italy's exports to Germany | Value in 2013", the prefix
+`tables.partner_value_cols` matches on), so the partner list does not
+have to be written by hand: each candidate file is scanned up to the
+first such header and mapped partner -> file name. HTML exports are read
+as text in chunks and the scan stops at the first match, so a directory
+of a few hundred downloads is indexed without parsing any table; real
+Excel workbooks fall back to reading the (cached) table.
+"""
+import fnmatch
+import html
+import os
+import re
+
+from .config import BASE_DIR
+from .sniff import sniff_file
+
+PATTERNS = ("*.xls", "*.xlsx", "*.htm", "*.html")
+SCAN_CHUNK = 1 << 16
+
+# the apostrophe may be written as an entity in the HTML
+_HEADER = re.compile(r"Italy(?:'|’|&#0?39;|&apos;|&rsquo;)s exports to\s+([^<|\r\n]+?)\s*(?:<|\||$)", re.I | re.M)
+
+
+def _header_in_text(path: str, encoding: str) -> str | None:
+    tail = ""
+    with open(path, "r", encoding=encoding, errors="replace") as f:
+        while True:
+            chunk = f.read(SCAN_CHUNK)
+            if not chunk:
+                return None
+            text = tail + chunk
+            m = _HEADER.search(text)
+            if m and m.end() < len(text):  # a match at the very end may be cut off
+                return html.unescape(m.group(1)).strip()
+            tail = text[-256:]
+
+
+def _header_in_table(path: str) -> str | None:
+    from .reader import read_trademap_file
+    from .tables import fix_header_two_rows
+
+    df = fix_header_two_rows(read_trademap_file(path))
+    for c in df.columns:
+        m = _HEADER.search(str(c))
+        if m:
+            return m.group(1).strip()
+    return None
+
+
+def partner_from_header(path: str) -> str | None:
+    """Partner name from a file's "Italy's exports to {partner}" header, None if it has none."""
+    info = sniff_file(path)
+    if info["format"] == "html":
+        return _header_in_text(path, info["encoding"] or "utf-8")
+    return _header_in_table(path)
+
+
+def discover_partners(data_dir: str = BASE_DIR, patterns=PATTERNS) -> dict:
+    """
+    {partner: file name} for every partner file in `data_dir`, sorted by partner.
+    Files without the header (the Italy / world product lists, ...) are skipped;
+    if two files name the same partner the first by file name is kept.
+    """
+    found = {}
+    for fname in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, fname)
+        if not os.path.isfile(path) or not any(fnmatch.fnmatch(fname.lower(), p) for p in patterns):
+            continue
+        partner = partner_from_header(path)
+        if partner is None:
+            continue
+        if partner in found:
+            print(f"WARNING: {fname} is also a {partner} file; keeping {found[partner]}")
+            continue
+        found[partner] = fname
+    return dict(sorted(found.items()))
@@ -0,0 +1,139 @@
+"""
+HS6 explorer: filter, sort and paginate the stable product table on the server.
+
+The product table (one row per stable HS6, sorted by code, see
+bundle.build_products) stays on the server; a query returns one page:
+
+  - HS2 / HS4 / HS6 prefix: codes are sorted uint32 and a prefix is a
+    contiguous code range ("84" = 840000..849999), so two searchsorted
+    calls give a slice of the table;
+  - RSCA range: one comparison over the avg_rsca column;
+  - partner set: a PresenceIndex query on the step2 presence bits
+    (exported to every selected partner, or to any of them);
+  - sort: each (column, direction) argsort is computed once and kept,
+    so a query is mask[order] plus a slice for the page.
+
+Value by year is only computed for the codes on the page, from the sparse
+values file, summed over the selected partners' entries; the all-partner
+totals (no partner selected) are summed once per HS6 x year and kept.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .hs6 import isin_sorted, lookup
+from .presence import PresenceIndex, at_least, k_of
+
+SORT_COLUMNS = ("avg_rsca", "partner_count", "years_positive", "hs6")
+PAGE_SIZES = (25, 50, 100, 200)
+
+
+class ProductPage(NamedTuple):
+    rows: pd.DataFrame  # the visible page only
+    total: int          # rows matching the filters
+    page: int           # 0-based, clipped to the available pages
+    pages: int
+
+
+def prefix_range(prefix: str) -> tuple:
+    """[lo, hi) uint32 range of the HS6 codes starting with `prefix` (0-6 digits)."""
+    prefix = (prefix or "").strip()
+    if not prefix:
+        return 0, 10 ** 6
+    if not prefix.isdigit() or len(prefix) > 6:
+        raise ValueError(f"HS prefix must be 1-6 digits, got {prefix!r}")
+    scale = 10 ** (6 - len(prefix))
+    lo = int(prefix) * scale
+    return lo, lo + scale
+
+
+class ProductExplorer:
+    """Server-side queries over the product table (+ presence bits and sparse values when available)."""
+
+    def __init__(self, products: pd.DataFrame, presence=None, values=None):
+        self.products = products.sort_values("code", kind="stable").reset_index(drop=True)
+        self.codes = self.products["code"].to_numpy(dtype=np.uint32)
+        self.index = PresenceIndex(presence) if presence is not None else None
+        self.values = values
+        self._orders = {}
+        self._totals = None  # (hs6, years) over all partners, on first use
+
+    @property
+    def partners(self) -> list:
+        return self.index.partners if self.index is not None else []
+
+    @property
+    def sort_columns(self) -> list:
+        return [c for c in SORT_COLUMNS if c in self.products.columns]
+
+    def order(self, column: str, ascending: bool = True) -> np.ndarray:
+        """Row order for one sort (missing values last), computed on first use."""
+        key = (column, ascending)
+        if key not in self._orders:
+            by = "code" if column == "hs6" else column
+            self._orders[key] = self.products[by].sort_values(
+                ascending=ascending, kind="stable", na_position="last"
+            ).index.to_numpy()
+        return self._orders[key]
+
+    def mask(self, prefix: str = "", rsca=None, partners=(), mode: str = "all") -> np.ndarray:
+        """Boolean mask over the product rows."""
+        lo, hi = prefix_range(prefix)
+        keep = np.zeros(len(self.codes), dtype=bool)
+        keep[np.searchsorted(self.codes, lo):np.searchsorted(self.codes, hi)] = True
+        if rsca is not None:
+            r = self.products["avg_rsca"].to_numpy(dtype=np.float64)
+            keep &= (r >= rsca[0]) & (r <= rsca[1])
+        if partners:
+            if self.index is None:
+                raise ValueError("Partner filters need the step2 presence index in the bundle")
+            if mode not in ("all", "any"):
+                raise ValueError(f"Unknown partner mode {mode!r}; use 'all' or 'any'")
+            q = at_least(partners) if mode == "all" else k_of(1, partners)
+            keep &= isin_sorted(self.codes, self.index.run([q])[0])
+        return keep
+
+    def query(self, prefix: str = "", rsca=None, partners=(), mode: str = "all",
+              sort: str = "avg_rsca", ascending: bool = False, page: int = 0,
+              page_size: int = 50) -> ProductPage:
+        """One page of the filtered, sorted product table."""
+        order = self.order(sort, ascending)
+        rows = order[self.mask(prefix, rsca, partners, mode)[order]]
+        pages = max(-(-len(rows) // page_size), 1)
+        page = min(max(int(page), 0), pages - 1)
+        idx = rows[page * page_size:(page + 1) * page_size]
+
+        out = self.products.iloc[idx].drop(columns="code").reset_index(drop=True)
+        if self.values is not None:
+            out = out.join(self.value_by_year(self.codes[idx], partners))
+        return ProductPage(out, len(rows), page, pages)
+
+    def value_by_year(self, codes, partners=()) -> pd.DataFrame:
+        """(codes, years) export value summed over `partners` (all when empty), one column per year."""
+        v = self.values
+        pos, found = lookup(v.hs6, codes)
+        columns = [f"value_{int(y)}" for y in v.years]
+        if not partners:
+            if self._totals is None:
+                flat = v.code.astype(np.int64) * len(v.years) + v.year
+                self._totals = np.bincount(
+                    flat, weights=v.value, minlength=len(v.hs6) * len(v.years)
+                ).reshape(len(v.hs6), len(v.years))
+            out = np.zeros((len(codes), len(v.years)))
+            out[found] = self._totals[pos[found]]
+            return pd.DataFrame(out, columns=columns)
+
+        # hs6 position -> row of the result, -1 for codes not on the page
+        slot = np.full(len(v.hs6), -1, dtype=np.int64)
+        slot[pos[found]] = np.flatnonzero(found)
+
+        rows = [v.partner_index(p) for p in partners if p in v.partners]
+        entries = np.concatenate(
+            [np.arange(v.indptr[p], v.indptr[p + 1]) for p in rows] or [np.zeros(0, dtype=np.int64)]
+        )
+        r = slot[v.code[entries]]
+        hit = r >= 0
+        flat = r[hit] * len(v.years) + v.year[entries][hit]
+        out = np.bincount(flat, weights=v.value[entries][hit], minlength=len(codes) * len(v.years))
+        return pd.DataFrame(out.reshape(len(codes), len(v.years)), columns=columns)
@@ -0,0 +1,51 @@
+"""
+HS6 codes as integers.
+
+From ingest onward an HS6 code is a uint32 (10121 for "010121"); 0 marks
+the TOTAL row and anything that is not a 1-6 digit code. Membership tests
+against the stable core are `searchsorted` lookups on a sorted array, and
+the zero-padded strings are only produced when a table is written out.
+"""
+import numpy as np
+import pandas as pd
+
+HS6_DTYPE = np.uint32
+INVALID = 0
+
+
+def encode_hs6(s) -> np.ndarray:
+    """Raw code column -> uint32 codes (same digit rules as normalize_hs6_series)."""
+    digits = pd.Series(s).astype(str).str.replace(r"\D", "", regex=True)
+    ok = digits.str.len().between(1, 6)
+    codes = pd.to_numeric(digits.where(ok, "0"))
+    return codes.to_numpy(dtype=HS6_DTYPE)
+
+
+def format_hs6(codes) -> np.ndarray:
+    """uint32 codes -> zero-padded 6-character strings (output boundary only)."""
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.size == 0:
+        return np.array([], dtype="<U6")
+    return np.char.zfill(codes.astype(str), 6)
+
+
+def lookup(index: np.ndarray, codes):
+    """(position in the sorted `index`, found) for every code."""
+    codes = np.asarray(codes, dtype=index.dtype)
+    pos = np.searchsorted(index, codes)
+    found = pos < len(index)
+    found[found] = index[pos[found]] == codes[found]
+    return pos, found
+
+
+def isin_sorted(codes, index: np.ndarray) -> np.ndarray:
+    """Boolean mask over `codes`: True where the code is in the sorted `index`."""
+    return lookup(index, codes)[1]
+
+
+def index_mask(index: np.ndarray, codes) -> np.ndarray:
+    """Boolean mask over a sorted code index: True where the code is in `codes`."""
+    pos, found = lookup(index, codes)
+    mask = np.zeros(len(index), dtype=bool)
+    mask[pos[found]] = True
+    return mask
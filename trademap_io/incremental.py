@@ -0,0 +1,185 @@
+"""
+Incremental (year-append) state for the RCA and stable-core stages.
+
+A state directory holds
+
+    rca_<year>.parquet     that year's RCA / RSCA rows (rca_table output)
+    accumulators.parquet   per-HS6 running totals over all stored years
+    state.json             the stored years, in append order
+
+The accumulators are what the stable rule needs (years with RSCA > 0,
+RSCA sum and years present for the average, current and longest run of
+positive years), so appending a year computes only that year's RCA and
+folds it in; the stable set is then read straight off the accumulators.
+Replacing or back-filling a year rebuilds the accumulators from the
+stored per-year files, which still needs no parsing or RCA work.
+"""
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .config import BASE_DIR
+from .hs6 import encode_hs6, format_hs6, lookup
+from .rca import ValueMatrix, rca_table
+
+STATE_DIR = os.path.join(BASE_DIR, "rca_state")
+
+
+class Accumulators(NamedTuple):
+    hs6: np.ndarray             # sorted codes (uint32)
+    labels: np.ndarray
+    years_positive: np.ndarray  # years with RSCA > 0
+    rsca_sum: np.ndarray
+    years_present: np.ndarray
+    current_run: np.ndarray     # positive years up to and including the last stored year
+    longest_run: np.ndarray
+    years: list
+
+
+def empty_accumulators() -> Accumulators:
+    z = np.zeros(0, dtype=np.int64)
+    return Accumulators(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=object), z, np.zeros(0), z, z, z, [])
+
+
+def _year_path(state_dir: str, year: int) -> str:
+    return os.path.join(state_dir, f"rca_{int(year)}.parquet")
+
+
+def stored_years(state_dir: str = STATE_DIR) -> list:
+    path = os.path.join(state_dir, "state.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["years"]
+
+
+def read_year(state_dir: str, year: int) -> pd.DataFrame:
+    return pd.read_parquet(_year_path(state_dir, year))
+
+
+def read_all_years(state_dir: str = STATE_DIR) -> pd.DataFrame:
+    """All stored years as one long table, ordered by year then hs6 (the italy.py layout)."""
+    return pd.concat([read_year(state_dir, y) for y in sorted(stored_years(state_dir))], ignore_index=True)
+
+
+def _reindex(acc: Accumulators, hs6: np.ndarray) -> Accumulators:
+    # move every accumulator onto a (larger) sorted code index, zeros for new codes
+    pos, found = lookup(hs6, acc.hs6)
+    assert found.all()
+
+    def grow(a, fill=0):
+        out = np.full(len(hs6), fill, dtype=a.dtype)
+        out[pos] = a
+        return out
+
+    return Accumulators(
+        hs6, grow(acc.labels, np.nan), grow(acc.years_positive), grow(acc.rsca_sum),
+        grow(acc.years_present), grow(acc.current_run), grow(acc.longest_run), list(acc.years),
+    )
+
+
+def fold_year(acc: Accumulators, year: int, table: pd.DataFrame) -> Accumulators:
+    """Add one year's rows (hs6 / product_label / RSCA) to accumulators of earlier years."""
+    if acc.years and year <= max(acc.years):
+        raise ValueError(f"Year {year} is not after the stored years {acc.years}; rebuild instead")
+    codes = table["hs6"].to_numpy(dtype=np.uint32)
+    acc = _reindex(acc, np.union1d(acc.hs6, codes).astype(np.uint32))
+    pos = np.searchsorted(acc.hs6, codes)
+
+    positive = np.zeros(len(acc.hs6), dtype=bool)
+    positive[pos] = table["RSCA"].to_numpy() > 0
+    rsca_sum = acc.rsca_sum.copy()
+    rsca_sum[pos] += table["RSCA"].to_numpy()
+    present = acc.years_present.copy()
+    present[pos] += 1
+    labels = acc.labels.copy()
+    new_label = pd.isna(labels[pos])
+    labels[pos[new_label]] = table["product_label"].to_numpy(dtype=object)[new_label]
+
+    # a run only continues from the previous calendar year; a skipped year breaks it
+    previous = acc.current_run if acc.years and year == max(acc.years) + 1 else 0
+    current = np.where(positive, previous + 1, 0)
+    return Accumulators(
+        acc.hs6, labels, acc.years_positive + positive, rsca_sum, present,
+        current, np.maximum(acc.longest_run, current), list(acc.years) + [int(year)],
+    )
+
+
+def rebuild_accumulators(state_dir: str = STATE_DIR) -> Accumulators:
+    acc = empty_accumulators()
+    for y in sorted(stored_years(state_dir)):
+        acc = fold_year(acc, y, read_year(state_dir, y))
+    return acc
+
+
+def save_state(state_dir: str, acc: Accumulators) -> None:
+    pd.DataFrame({
+        "hs6": acc.hs6, "product_label": acc.labels, "years_positive": acc.years_positive,
+        "rsca_sum": acc.rsca_sum, "years_present": acc.years_present,
+        "current_run": acc.current_run, "longest_run": acc.longest_run,
+    }).to_parquet(os.path.join(state_dir, "accumulators.parquet"), index=False)
+    with open(os.path.join(state_dir, "state.json"), "w", encoding="utf-8") as f:
+        json.dump({"years": acc.years}, f, indent=2)
+
+
+def load_accumulators(state_dir: str = STATE_DIR) -> Accumulators:
+    years = stored_years(state_dir)
+    if not years:
+        return empty_accumulators()
+    df = pd.read_parquet(os.path.join(state_dir, "accumulators.parquet"))
+    return Accumulators(
+        df["hs6"].to_numpy(dtype=np.uint32), df["product_label"].to_numpy(dtype=object),
+        df["years_positive"].to_numpy(), df["rsca_sum"].to_numpy(), df["years_present"].to_numpy(),
+        df["current_run"].to_numpy(), df["longest_run"].to_numpy(), years,
+    )
+
+
+def store_year(state_dir: str, year: int, table: pd.DataFrame) -> Accumulators:
+    """Persist one year's RCA rows and update the accumulators (fold, or rebuild if not the newest)."""
+    os.makedirs(state_dir, exist_ok=True)
+    table = table.assign(hs6=table["hs6"].to_numpy(dtype=np.uint32))
+    table.to_parquet(_year_path(state_dir, year), index=False)
+    acc = load_accumulators(state_dir)
+    if acc.years and year <= max(acc.years):
+        with open(os.path.join(state_dir, "state.json"), "w", encoding="utf-8") as f:
+            json.dump({"years": sorted(set(acc.years) | {int(year)})}, f, indent=2)
+        acc = rebuild_accumulators(state_dir)
+    else:
+        acc = fold_year(acc, year, table)
+    save_state(state_dir, acc)
+    return acc
+
+
+def append_year(state_dir: str, year: int, italy: ValueMatrix, world: ValueMatrix) -> Accumulators:
+    """RCA for a single year (matrices holding that year) and fold it into the state."""
+    table = rca_table(italy, world)
+    table = table[table["year"] == year]
+    if table.empty:
+        raise ValueError(f"Year {year} is not in both the Italy and world tables")
+    return store_year(state_dir, year, table)
+
+
+def init_from_long(state_dir: str, rsca_long: pd.DataFrame) -> Accumulators:
+    """Seed the state from an existing italy.py output, one stored year per year in it."""
+    rsca_long = rsca_long.assign(hs6=encode_hs6(rsca_long["hs6"]))
+    acc = None
+    for year, table in rsca_long.groupby("year", sort=True):
+        acc = store_year(state_dir, int(year), table.reset_index(drop=True))
+    return acc
+
+
+def accumulated_stable(acc: Accumulators, min_years: int = 3) -> pd.DataFrame:
+    """Stable core (RSCA > 0 in >= min_years years) in the build_stable_core.py layout."""
+    mask = acc.years_positive >= min_years
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = acc.rsca_sum / acc.years_present
+    return pd.DataFrame({
+        "hs6": format_hs6(acc.hs6[mask]),
+        "product_label": acc.labels[mask],
+        "years_positive": acc.years_positive[mask],
+        "longest_run": acc.longest_run[mask],
+        "avg_rsca": avg[mask],
+    })
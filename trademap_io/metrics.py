@@ -0,0 +1,447 @@
+"""
+Registered per-partner metrics and the one-pass driver.
+
+Each metric is a pair of functions:
+  compute(partner, frame, stable) -> per-partner result
+  finalize(results, stable)       -> {output file name: DataFrame}
+where `frame` is the canonical frame from tables.load_partner and
+`results` is a list of (partner, result) in partner order (PARTNER_FILES,
+or the discovered partners).
+`run_metrics` loads every partner file once and feeds the same frame to
+all requested metrics, so step1/step2/step3 and the coverage ratio come
+out of a single pass over the data.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .config import BASE_DIR, STABLE_FILE
+from .hs6 import INVALID, encode_hs6, format_hs6, index_mask, isin_sorted
+from .parallel import map_in_order
+from .presence import PresenceMatrix, code_pairs
+from .tables import load_partner, year_columns
+
+
+class Metric(NamedTuple):
+    name: str
+    compute: object
+    finalize: object
+    cube_compute: object = None
+
+
+class StableCore(NamedTuple):
+    hs6: np.ndarray    # sorted unique stable codes (uint32)
+    rsca: np.ndarray   # avg_rsca aligned with hs6 (None if the file has no avg_rsca)
+    total_rsca: float
+
+
+METRICS = {}
+
+
+def register_metric(name: str, finalize):
+    def deco(compute):
+        METRICS[name] = Metric(name, compute, finalize)
+        return compute
+    return deco
+
+
+def register_cube_metric(name: str):
+    """Attach the NumPy (cube) version of an already registered metric."""
+    def deco(cube_compute):
+        METRICS[name] = METRICS[name]._replace(cube_compute=cube_compute)
+        return cube_compute
+    return deco
+
+
+class CubeView(NamedTuple):
+    """One partner's slice of a value cube plus the stable core aligned to its index."""
+    values: np.ndarray    # (hs6, years)
+    listed: np.ndarray    # bool (hs6,): code appears in the partner file
+    in_core: np.ndarray   # bool (hs6,): code is in the stable core
+    hs6: np.ndarray
+    years: list
+
+
+def load_stable(path: str = STABLE_FILE) -> StableCore:
+    stable = pd.read_csv(path)
+    if "hs6" not in stable.columns:
+        raise ValueError("Stable file must have a column named 'hs6'.")
+    stable["hs6"] = encode_hs6(stable["hs6"])
+    stable = stable[stable["hs6"] != INVALID]
+    stable = stable.drop_duplicates("hs6", keep="last").sort_values("hs6")
+    rsca = stable["avg_rsca"].to_numpy(dtype=np.float64) if "avg_rsca" in stable.columns else None
+    return StableCore(
+        hs6=stable["hs6"].to_numpy(dtype=np.uint32),
+        rsca=rsca,
+        total_rsca=float(rsca.sum()) if rsca is not None else 0.0,
+    )
+
+
+def exported_mask(frame: pd.DataFrame) -> pd.Series:
+    """value > 0 in any year"""
+    return (frame[year_columns(frame)] > 0).any(axis=1)
+
+
+# ---------------- step1: value share ----------------
+def _finalize_value_share(results, stable):
+    rows = [row for _, (row, _) in results]
+    by_year = [r for _, (_, ys) in results for r in ys]
+    return {
+        "step1_partner_value_share_stable.csv":
+            pd.DataFrame(rows).sort_values("value_share_stable", ascending=False),
+        "step1_partner_value_share_stable_by_year.csv":
+            pd.DataFrame(by_year).sort_values(["partner", "year"]),
+    }
+
+
+@register_metric("value_share", _finalize_value_share)
+def value_share(partner, frame, stable):
+    years = year_columns(frame)
+    vals = frame[years]
+    stable_mask = isin_sorted(frame["hs6"].to_numpy(), stable.hs6)
+
+    total_all = float(vals.sum(axis=0).sum())
+    total_stable = float(vals.loc[stable_mask].sum(axis=0).sum())
+    row = {
+        "partner": partner,
+        "total_export_value_all_HS_2013_2024": total_all,
+        "total_export_value_stable_HS_2013_2024": total_stable,
+        "value_share_stable": (total_stable / total_all) if total_all > 0 else 0.0,
+        "hs6_count_in_file": int(frame["hs6"].nunique()),
+        "stable_hs6_exported_count": int(frame.loc[stable_mask, "hs6"].nunique()),
+        "years_detected": int(len(years)),
+    }
+
+    by_year = []
+    for y in years:
+        all_y = float(vals[y].sum())
+        stable_y = float(vals.loc[stable_mask, y].sum())
+        by_year.append({
+            "partner": partner,
+            "year": y,
+            "export_value_all": all_y,
+            "export_value_stable": stable_y,
+            "value_share_stable": (stable_y / all_y) if all_y > 0 else 0.0,
+        })
+    return row, by_year
+
+
+@register_cube_metric("value_share")
+def value_share_cube(partner, view, stable):
+    by_year_all = view.values.sum(axis=0)
+    by_year_stable = view.values[view.in_core].sum(axis=0)
+    total_all = float(by_year_all.sum())
+    total_stable = float(by_year_stable.sum())
+    row = {
+        "partner": partner,
+        "total_export_value_all_HS_2013_2024": total_all,
+        "total_export_value_stable_HS_2013_2024": total_stable,
+        "value_share_stable": (total_stable / total_all) if total_all > 0 else 0.0,
+        "hs6_count_in_file": int(view.listed.sum()),
+        "stable_hs6_exported_count": int((view.listed & view.in_core).sum()),
+        "years_detected": int(len(view.years)),
+    }
+    by_year = [{
+        "partner": partner,
+        "year": int(y),
+        "export_value_all": float(a),
+        "export_value_stable": float(b),
+        "value_share_stable": (float(b) / float(a)) if a > 0 else 0.0,
+    } for y, a, b in zip(view.years, by_year_all, by_year_stable)]
+    return row, by_year
+
+
+# ---------------- step2: exported-set presence ----------------
+DENSE_MATRIX_FILE = "step2_partner_hs6_matrix_binary.csv"
+
+
+class DenseMatrix(NamedTuple):
+    """step2's partner x HS6 0/1 table, expanded from the packed bits only when it is saved."""
+    presence: PresenceMatrix
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.presence.dense().astype(int), index=self.presence.partners,
+            columns=format_hs6(self.presence.hs6),
+        )
+
+    def save(self, path: str) -> None:
+        self.frame().to_csv(path)
+
+
+def _finalize_presence(results, stable):
+    partners = [p for p, _ in results]
+    # (partner, stable position) of every exported pair, partner-major; the packed
+    # bits are set from them and the dense 0/1 matrix is only built when a script
+    # writes it (--dense-matrix)
+    p, h = code_pairs(stable.hs6, [codes for _, codes in results])
+    presence = PresenceMatrix.from_pairs(partners, stable.hs6, p, h)
+    counts = presence.partner_count()
+    hs6 = format_hs6(stable.hs6)
+    names = np.array(partners, dtype=object)
+
+    # partner names per HS6: the pairs grouped by code, partners still in order
+    by_code = names[p[np.argsort(h, kind="stable")]]
+    ends = np.cumsum(counts)
+    freq = pd.DataFrame({
+        "hs6": hs6,
+        "partner_count": counts,
+        "partners": ["; ".join(by_code[e - c:e]) for c, e in zip(counts, ends)],
+    }).sort_values(["partner_count", "hs6"], ascending=[False, True])
+
+    edges = pd.DataFrame({"partner": names[p], "hs6": hs6[h]})
+
+    return {
+        "step2_presence_index.npz": presence,
+        "step2_hs6_partner_frequency.csv": freq,
+        "step2_partner_hs6_edges.csv": edges,
+        DENSE_MATRIX_FILE: DenseMatrix(presence),
+        "step2_common_hs6_ge3.csv": freq[freq["partner_count"] >= 3].copy(),
+        "step2_common_hs6_ge5.csv": freq[freq["partner_count"] >= 5].copy(),
+        "step2_common_hs6_all10.csv": freq[freq["partner_count"] == len(partners)].copy(),
+    }
+
+
+@register_metric("exported_presence", _finalize_presence)
+def exported_presence(partner, frame, stable):
+    """Sorted stable codes with value > 0 in any year."""
+    codes = frame["hs6"].to_numpy()
+    return np.unique(codes[exported_mask(frame).to_numpy() & isin_sorted(codes, stable.hs6)])
+
+
+@register_cube_metric("exported_presence")
+def exported_presence_cube(partner, view, stable):
+    exported = (view.values > 0).any(axis=1) & view.in_core
+    return np.asarray(view.hs6[exported])
+
+
+# ---------------- step3: weighted RSCA coverage ----------------
+def _finalize_weighted(results, stable):
+    partners = [p for p, _ in results]
+    # each partner's avg RSCA sum over its exported stable codes, straight from the pairs
+    p, h = code_pairs(stable.hs6, [codes for _, codes in results])
+    weighted_sum = np.bincount(p, weights=stable.rsca[h], minlength=len(partners))
+    out = pd.DataFrame({
+        "partner": partners,
+        "exported_stable_hs6": np.bincount(p, minlength=len(partners)),
+        "weighted_rsca_sum": weighted_sum,
+        "weighted_rsca_coverage": weighted_sum / stable.total_rsca,
+    })
+    return {
+        "step3_partner_weighted_rsca_coverage.csv":
+            out.sort_values("weighted_rsca_coverage", ascending=False),
+    }
+
+
+@register_metric("weighted_rsca_coverage", _finalize_weighted)
+def weighted_rsca_coverage(partner, frame, stable):
+    """Exported stable codes; the RSCA-weighted sums are one product in finalize."""
+    if stable.rsca is None:
+        raise ValueError("weighted_rsca_coverage needs an 'avg_rsca' column in the stable file")
+    return exported_presence(partner, frame, stable)
+
+
+@register_cube_metric("weighted_rsca_coverage")
+def weighted_rsca_coverage_cube(partner, view, stable):
+    if stable.rsca is None:
+        raise ValueError("weighted_rsca_coverage needs an 'avg_rsca' column in the stable file")
+    return exported_presence_cube(partner, view, stable)
+
+
+# ---------------- analysis_partner_coverage_*: coverage ratio ----------------
+def _finalize_coverage(results, stable):
+    out = pd.DataFrame([r for _, r in results])
+    return {
+        "italy_stable_rsca_partner_coverage.csv":
+            out.sort_values("coverage_ratio", ascending=False),
+    }
+
+
+@register_metric("coverage_ratio", _finalize_coverage)
+def coverage_ratio(partner, frame, stable):
+    """Share of stable HS6 listed in the partner file at all."""
+    covered = int(index_mask(stable.hs6, frame["hs6"].to_numpy()).sum())
+    return {
+        "partner": partner,
+        "stable_hs6_total": len(stable.hs6),
+        "stable_hs6_exported": covered,
+        "coverage_ratio": covered / len(stable.hs6),
+    }
+
+
+def _finalize_coverage_gt0(results, stable):
+    out = pd.DataFrame([r for _, r in results])
+    return {
+        "italy_stable_rsca_partner_coverage_value_gt0.csv":
+            out.sort_values("coverage_ratio", ascending=False),
+    }
+
+
+@register_metric("coverage_ratio_value_gt0", _finalize_coverage_gt0)
+def coverage_ratio_value_gt0(partner, frame, stable):
+    """Share of stable HS6 with value > 0 in any year."""
+    covered = exported_presence(partner, frame, stable)
+    return {
+        "partner": partner,
+        "stable_hs6_total": len(stable.hs6),
+        "stable_hs6_exported_value_gt0": len(covered),
+        "coverage_ratio": len(covered) / len(stable.hs6),
+        "years_detected": len(year_columns(frame)),
+    }
+
+
+@register_cube_metric("coverage_ratio")
+def coverage_ratio_cube(partner, view, stable):
+    covered = int((view.listed & view.in_core).sum())
+    return {
+        "partner": partner,
+        "stable_hs6_total": len(stable.hs6),
+        "stable_hs6_exported": covered,
+        "coverage_ratio": covered / len(stable.hs6),
+    }
+
+
+@register_cube_metric("coverage_ratio_value_gt0")
+def coverage_ratio_value_gt0_cube(partner, view, stable):
+    covered = int(((view.values > 0).any(axis=1) & view.in_core).sum())
+    return {
+        "partner": partner,
+        "stable_hs6_total": len(stable.hs6),
+        "stable_hs6_exported_value_gt0": covered,
+        "coverage_ratio": covered / len(stable.hs6),
+        "years_detected": len(view.years),
+    }
+
+
+# ---------------- driver ----------------
+def compute_partner(partner: str, fname: str, names: list, stable: StableCore, base_dir: str,
+                    dataset: str = None, years=None) -> dict:
+    """Load one partner once (raw file or Parquet store) and run every requested metric on it."""
+    print("Processing:", partner)
+    if dataset:
+        from .store import read_frame
+
+        frame = read_frame(dataset, "Italy", partner, years)
+    else:
+        frame = load_partner(partner, fname, base_dir)
+        if years:
+            frame = frame[["hs6", "label"] + [y for y in year_columns(frame) if y in set(years)]]
+    print(f"  {partner}: cells coerced to 0: {frame.attrs.get('coerced', 0)}")
+    return {name: METRICS[name].compute(partner, frame, stable) for name in names}
+
+
+def run_cube_metrics(names, cube_path: str, stable: StableCore, partners=None, years=None) -> list:
+    """Per-partner results from a memory-mapped cube, as NumPy reductions (no parsing)."""
+    from .cube import open_cube
+
+    cube = open_cube(cube_path)
+    in_core = index_mask(cube.hs6, stable.hs6)
+    ysel = np.isin(cube.years, years) if years else np.ones(len(cube.years), dtype=bool)
+
+    per_partner = []
+    for partner in partners or cube.partners:
+        print("Processing:", partner)
+        p = cube.partner_index(partner)
+        # only the years this partner's file has, so a missing year is not a row of zeros
+        keep = ysel & cube.listed_years[p].astype(bool)
+        view = CubeView(
+            values=np.asarray(cube.values[p][:, keep], dtype=np.float64),
+            listed=cube.listed[p].astype(bool),
+            in_core=in_core,
+            hs6=cube.hs6,
+            years=[int(y) for y in cube.years[keep]],
+        )
+        per_partner.append({name: METRICS[name].cube_compute(partner, view, stable) for name in names})
+    return per_partner
+
+
+def run_sparse_metrics(names, sparse_path: str, stable: StableCore, partners=None, years=None) -> list:
+    """Per-partner results from a sparse values file (.npz), each partner expanded over its listed codes only."""
+    from .sparse import load_sparse
+
+    sv = load_sparse(sparse_path)
+    ysel = np.isin(sv.years, years) if years else np.ones(len(sv.years), dtype=bool)
+
+    per_partner = []
+    for partner in partners or sv.partners:
+        print("Processing:", partner)
+        p = sv.partner_index(partner)
+        hs6, values = sv.view(p)
+        keep = ysel & sv.listed_years[p]
+        view = CubeView(
+            values=values[:, keep],
+            listed=np.ones(len(hs6), dtype=bool),
+            in_core=isin_sorted(hs6, stable.hs6),
+            hs6=hs6,
+            years=[int(y) for y in sv.years[keep]],
+        )
+        per_partner.append({name: METRICS[name].cube_compute(partner, view, stable) for name in names})
+    return per_partner
+
+
+def compute_metrics(names, partner_files: dict, stable: StableCore, base_dir: str, jobs: int = 1,
+                    dataset: str = None, years=None, cube: str = None) -> list:
+    """Per-partner results ({metric: result}, in partner_files order), before finalize."""
+    unknown = [n for n in names if n not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; available: {sorted(METRICS)}")
+
+    if cube:
+        run = run_sparse_metrics if cube.endswith(".npz") else run_cube_metrics
+        return run(names, cube, stable, list(partner_files), years)
+
+    return map_in_order(
+        compute_partner,
+        [(partner, fname, list(names), stable, base_dir, dataset, years)
+         for partner, fname in partner_files.items()],
+        jobs,
+    )
+
+
+def run_metrics(names, partner_files: dict, stable: StableCore, base_dir: str, jobs: int = 1,
+                dataset: str = None, years=None, cube: str = None) -> dict:
+    """
+    {output file name: DataFrame} for the requested metrics, in one pass.
+    `cube` is a cube directory (build_cube.py) or a sparse values .npz (build_cube.py --sparse).
+    """
+    per_partner = compute_metrics(names, partner_files, stable, base_dir, jobs, dataset, years, cube)
+    return finalize_metrics(names, list(partner_files), per_partner, stable)
+
+
+def finalize_metrics(names, partners: list, per_partner: list, stable: StableCore) -> dict:
+    outputs = {}
+    for name in names:
+        results = [(partner, res[name]) for partner, res in zip(partners, per_partner)]
+        outputs.update(METRICS[name].finalize(results, stable))
+    return outputs
+
+
+def select_partners(partner_files: dict, args) -> dict:
+    """
+    PARTNER_FILES (or, with --discover, every partner file found in BASE_DIR)
+    narrowed by --partners (store-only partners map to None).
+    """
+    if getattr(args, "discover", False):
+        from .discover import discover_partners
+
+        partner_files = discover_partners(BASE_DIR)
+    if not getattr(args, "partners", None):
+        return dict(partner_files)
+    unknown = [p for p in args.partners if p not in partner_files and not (args.dataset or args.cube)]
+    if unknown:
+        raise ValueError(f"Unknown partners {unknown}; known: {list(partner_files)}")
+    return {p: partner_files.get(p) for p in args.partners}
+
+
+def write_outputs(outputs: dict, base_dir: str) -> list:
+    paths = []
+    for fname, df in outputs.items():
+        path = os.path.join(base_dir, fname)
+        if isinstance(df, pd.DataFrame):
+            df.to_csv(path, index=False)
+        else:
+            df.save(path)
+        paths.append(path)
+    return paths
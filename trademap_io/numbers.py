@@ -0,0 +1,63 @@
+"""
+Vectorised TradeMap number parsing.
+
+Same rules as the per-cell `to_number` the step scripts used: blanks, NaN,
+"-", "n/a", "na" and "null" become 0; spaces and thousands separators are
+dropped; anything left that is not a number becomes 0. The work is done
+with pandas string ops on whole columns instead of one regex per cell.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+PLACEHOLDERS = {"-", "n/a", "na", "null"}
+
+
+def to_number(x) -> float:
+    """Scalar reference version of the rules (kept for one-off values)."""
+    if pd.isna(x):
+        return 0.0
+    s = str(x).strip()
+    if s == "" or s.lower() in PLACEHOLDERS:
+        return 0.0
+    s = s.replace(" ", "").replace(",", "")
+    s = re.sub(r"[^0-9\.\-]", "", s)
+    if s in {"", "-", "."}:
+        return 0.0
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+
+def to_number_series(s: pd.Series) -> tuple[pd.Series, int]:
+    """Column -> float64 values and the number of cells coerced to 0."""
+    if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        vals = s.astype(np.float64)
+        missing = vals.isna()
+        return vals.where(~missing, 0.0), int(missing.sum())
+
+    missing = s.isna()
+    txt = (
+        s.where(~missing, "")
+        .astype("string")
+        .str.replace(" ", "", regex=False)
+        .str.replace(",", "", regex=False)
+        .str.replace(r"[^0-9\.\-]", "", regex=True)
+    )
+    # what float() accepts once only digits, "." and "-" are left;
+    # placeholders and junk ("", "-", ".", "1-", "1.2.3") fail and become 0
+    ok = txt.str.fullmatch(r"-?(\d+\.?\d*|\.\d+)").fillna(False).astype(bool)
+    vals = txt.where(ok, "0").astype(np.float64)
+    return pd.Series(vals.to_numpy(), index=s.index), int((~ok).sum())
+
+
+def to_number_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """to_number_series over every column; returns the frame and total coerced cells."""
+    cols = {}
+    coerced = 0
+    for c in df.columns:
+        cols[c], n = to_number_series(df[c])
+        coerced += n
+    return pd.DataFrame(cols, index=df.index), coerced
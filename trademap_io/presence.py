@@ -0,0 +1,253 @@
+"""
+Partner x HS6 export presence as packed bit arrays.
+
+Presence is kept both ways round, bit-packed with numpy.packbits
+(bitorder="little", so bit i of a row is byte i // 8, bit i % 8):
+
+    partner_bits  (partners, ceil(hs6 / 8))   partner -> HS6 bitmap
+    hs6_bits      (hs6, ceil(partners / 8))   HS6 -> partner bitmask
+
+Counts are popcounts over the packed bytes (a 256-entry table), so the
+step2 partner counts and thresholds are array operations whatever the
+number of partners or stable codes.
+
+PresenceIndex answers partner-combination questions on the HS6 -> partner
+masks: every query is "at least k of the partners in N, none of E", so
+exactly / at least / A-but-not-B / k-of-n and whole batches of them are
+a few byte-wise ANDs and popcounts over the HS6 axis. step2 saves the
+matrix as step2_presence_index.npz; `load_presence` reads that (or the
+step2 binary CSV) so callers do not have to scan the CSV themselves.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .hs6 import encode_hs6, lookup
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack(mask: np.ndarray) -> np.ndarray:
+    """Bool (rows, n) -> uint8 (rows, ceil(n / 8))."""
+    return np.packbits(mask, axis=1, bitorder="little")
+
+
+def unpack(bits: np.ndarray, n: int) -> np.ndarray:
+    return np.unpackbits(bits, axis=1, count=n, bitorder="little").astype(bool)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Set bits per row of a packed (rows, bytes) array."""
+    return POPCOUNT[bits].sum(axis=1, dtype=np.int64)
+
+
+def popcount64(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 (numpy >= 2 has a ufunc for it)."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+class PresenceMatrix(NamedTuple):
+    partners: list
+    hs6: np.ndarray           # sorted codes (uint32), the HS6 axis
+    partner_bits: np.ndarray  # (partners, ceil(hs6 / 8))
+    hs6_bits: np.ndarray      # (hs6, ceil(partners / 8))
+
+    @classmethod
+    def from_dense(cls, partners: list, hs6: np.ndarray, present: np.ndarray) -> "PresenceMatrix":
+        present = np.asarray(present, dtype=bool).reshape(len(partners), len(hs6))
+        return cls(list(partners), hs6, pack(present), pack(present.T))
+
+    @classmethod
+    def from_pairs(cls, partners: list, hs6: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> "PresenceMatrix":
+        """(partner position, hs6 position) pairs set straight in the packed bits, no dense matrix."""
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        partner_bits = np.zeros((len(partners), (len(hs6) + 7) // 8), dtype=np.uint8)
+        hs6_bits = np.zeros((len(hs6), (len(partners) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(partner_bits, (rows, cols // 8), (1 << (cols % 8)).astype(np.uint8))
+        np.bitwise_or.at(hs6_bits, (cols, rows // 8), (1 << (rows % 8)).astype(np.uint8))
+        return cls(list(partners), hs6, partner_bits, hs6_bits)
+
+    @classmethod
+    def from_codes(cls, partners: list, hs6: np.ndarray, codes: list) -> "PresenceMatrix":
+        """One array of exported codes per partner, on the sorted `hs6` index (others ignored)."""
+        rows, cols = code_pairs(hs6, codes)
+        return cls.from_pairs(partners, hs6, rows, cols)
+
+    def reindex(self, hs6: np.ndarray) -> "PresenceMatrix":
+        """The same presence on another sorted code index (codes not in it dropped, new codes absent)."""
+        pos, found = lookup(hs6, self.hs6)
+        hs6_bits = np.zeros((len(hs6), self.hs6_bits.shape[1]), dtype=np.uint8)
+        hs6_bits[pos[found]] = self.hs6_bits[found]
+        partner_bits = np.ascontiguousarray(pack(unpack(hs6_bits, len(self.partners)).T))
+        return PresenceMatrix(self.partners, hs6, partner_bits, hs6_bits)
+
+    def dense(self) -> np.ndarray:
+        """Bool (partners, hs6)."""
+        return unpack(self.partner_bits, len(self.hs6))
+
+    def partner_count(self) -> np.ndarray:
+        """Number of partners per HS6."""
+        return popcount(self.hs6_bits)
+
+    def hs6_count(self) -> np.ndarray:
+        """Number of HS6 per partner."""
+        return popcount(self.partner_bits)
+
+    def pair_counts(self, block: int = 64) -> np.ndarray:
+        """(partners, partners) number of HS6 exported to both: popcount of the ANDed bitmaps."""
+        words = _as_words(self.partner_bits)
+        out = np.empty((len(words), len(words)), dtype=np.int64)
+        for start in range(0, len(words), block):
+            both = words[start:start + block, None, :] & words[None, :, :]
+            out[start:start + block] = popcount64(both).sum(axis=2, dtype=np.int64)
+        return out
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, partners=np.array(self.partners, dtype=str), hs6=self.hs6,
+            partner_bits=self.partner_bits, hs6_bits=self.hs6_bits,
+        )
+
+
+def code_pairs(hs6: np.ndarray, codes: list):
+    """(partner position, hs6 position) of every code in `codes` (one array per partner) found in `hs6`."""
+    rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for i, c in enumerate(codes):
+        pos, found = lookup(hs6, c)
+        rows.append(np.full(int(found.sum()), i, dtype=np.int64))
+        cols.append(pos[found].astype(np.int64))
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def _as_words(bits: np.ndarray) -> np.ndarray:
+    # zero-pad packed rows to a multiple of 8 bytes and view them as uint64
+    pad = (-bits.shape[1]) % 8
+    padded = np.pad(bits, ((0, 0), (0, pad))) if pad else bits
+    return np.ascontiguousarray(padded).view("<u8")
+
+
+def load_presence(path: str) -> PresenceMatrix:
+    """
+    PresenceMatrix from step2_presence_index.npz, step2_partner_hs6_edges.csv
+    (HS6 axis = the codes in the file) or step2_partner_hs6_matrix_binary.csv.
+    """
+    if os.path.splitext(path)[1] == ".npz":
+        with np.load(path) as z:
+            return PresenceMatrix(
+                [str(p) for p in z["partners"]], z["hs6"], z["partner_bits"], z["hs6_bits"],
+            )
+    mat = pd.read_csv(path, index_col=0)
+    if list(mat.columns) == ["hs6"]:
+        edges = mat.reset_index()
+        codes = encode_hs6(edges["hs6"])
+        partners = list(dict.fromkeys(str(p) for p in edges["partner"]))
+        by_partner = edges["partner"].astype(str).to_numpy()
+        return PresenceMatrix.from_codes(
+            partners, np.unique(codes), [codes[by_partner == p] for p in partners],
+        )
+    hs6 = encode_hs6(pd.Series(mat.columns))
+    order = np.argsort(hs6, kind="stable")
+    return PresenceMatrix.from_dense(
+        [str(p) for p in mat.index], hs6[order], mat.to_numpy()[:, order] > 0,
+    )
+
+
+# ---------------- partner-combination queries ----------------
+class Query(NamedTuple):
+    """
+    HS6 exported to at least `k` of the partners in `among` and to none in `exclude`.
+    A partner listed twice counts once; k above the number of distinct partners matches nothing.
+    """
+    among: tuple
+    k: int
+    exclude: tuple = ()
+
+
+def at_least(partners) -> Query:
+    """Exported to every partner in `partners` (others allowed)."""
+    return Query(tuple(partners), len(set(partners)))
+
+
+def k_of(k: int, partners) -> Query:
+    return Query(tuple(partners), k)
+
+
+def but_not(include, exclude) -> Query:
+    """Exported to every partner in `include` and to none in `exclude`."""
+    return Query(tuple(include), len(set(include)), tuple(exclude))
+
+
+class PresenceIndex:
+    """Inverted index over a PresenceMatrix (HS6 -> partner mask, partner -> HS6 bitmap)."""
+
+    def __init__(self, presence: PresenceMatrix):
+        self.presence = presence
+        self.partners = list(presence.partners)
+        self._pos = {p: i for i, p in enumerate(self.partners)}
+        # HS6 -> partner masks as 64-bit words, one contiguous column per word:
+        # one AND / compare over the HS6 axis covers 64 partners
+        self._cols = np.ascontiguousarray(_as_words(presence.hs6_bits).T)
+
+    def mask(self, partners) -> np.ndarray:
+        """Partner mask (little-endian 64-bit words, as in hs6_bits) for a set of partner names."""
+        m = np.zeros(self._cols.shape[0], dtype="<u8")
+        for p in partners:
+            if p not in self._pos:
+                raise KeyError(f"Unknown partner {p!r}; known: {self.partners}")
+            i = self._pos[p]
+            m[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+        return m
+
+    def exactly(self, partners) -> np.ndarray:
+        """HS6 exported to exactly this set of partners."""
+        return self.run([but_not(partners, [p for p in self.partners if p not in set(partners)])])[0]
+
+    def at_least(self, partners) -> np.ndarray:
+        return self.run([at_least(partners)])[0]
+
+    def but_not(self, include, exclude) -> np.ndarray:
+        return self.run([but_not(include, exclude)])[0]
+
+    def k_of(self, k: int, partners=None) -> np.ndarray:
+        return self.run([k_of(k, self.partners if partners is None else partners)])[0]
+
+    def run(self, queries) -> list:
+        """Sorted HS6 code arrays, one per Query."""
+        return [self.presence.hs6[self._match(q)] for q in queries]
+
+    def _match(self, q: Query) -> np.ndarray:
+        # only the 64-bit words a query's masks touch are read; a partner named
+        # twice counts once, so "k of" can never ask for more partners than given
+        unique = set(q.among)
+        among, exclude = self.mask(unique), self.mask(q.exclude)
+        if q.k > len(unique):
+            return np.zeros(len(self.presence.hs6), dtype=bool)
+        hit = np.ones(len(self.presence.hs6), dtype=bool)
+        if q.k == len(unique):
+            for j in np.flatnonzero(among):
+                hit &= (self._cols[j] & among[j]) == among[j]
+        else:
+            count = np.zeros(len(hit), dtype=np.int64)
+            for j in np.flatnonzero(among):
+                count += popcount64(self._cols[j] & among[j])
+            hit &= count >= q.k
+        for j in np.flatnonzero(exclude):
+            hit &= (self._cols[j] & exclude[j]) == 0
+        return hit
+
+    def partners_of(self, code: int) -> list:
+        """Partners an HS6 code is exported to."""
+        i = np.searchsorted(self.presence.hs6, code)
+        if i >= len(self.presence.hs6) or self.presence.hs6[i] != code:
+            return []
+        row = unpack(self.presence.hs6_bits[i:i + 1], len(self.partners))[0]
+        return [p for p, on in zip(self.partners, row) if on]
+
+    def codes_of(self, partner: str) -> np.ndarray:
+        """HS6 codes exported to one partner."""
+        row = self.presence.partner_bits[self._pos[partner]:self._pos[partner] + 1]
+        return self.presence.hs6[unpack(row, len(self.presence.hs6))[0]]
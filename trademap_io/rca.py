@@ -0,0 +1,176 @@
+"""
+Matrix RCA / RSCA engine.
+
+A reporter table and the world table are each turned into one HS6 x year
+value matrix on a sorted uint32 HS6 index (duplicate codes summed, TOTAL
+rows dropped). RCA is then a couple of broadcast divisions:
+
+    RCA  = ((x_r + eps) / (X_r + eps)) / ((x_w + eps) / (X_w + eps))
+    RSCA = (RCA - 1) / (RCA + 1)
+
+where x is the HS6 value in a year and X the reporter / world total of
+that year. No melt to long form and no merge chain: the only long table
+is the output itself (one row per reporter code and year, ordered by year
+then hs6, the same rows and columns italy.py has always written).
+"""
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .hs6 import INVALID, encode_hs6, lookup
+
+EPS = 1e-12
+
+
+class ValueMatrix(NamedTuple):
+    hs6: np.ndarray       # sorted unique codes (uint32)
+    years: np.ndarray     # sorted years (int64)
+    values: np.ndarray    # (hs6, years)
+    labels: np.ndarray    # first non-empty label per code (object)
+
+
+def value_matrix(df: pd.DataFrame, code_col, label_col, value_cols: list) -> ValueMatrix:
+    """HS6 x year matrix from a wide TradeMap table ("... value in 2013" columns)."""
+    codes = encode_hs6(df[code_col])
+    keep = codes != INVALID
+    col_years = np.array([int(re.search(r"(\d{4})", str(c)).group(1)) for c in value_cols], dtype=np.int64)
+    # non-numeric cells count as 0, as pd.to_numeric(errors="coerce").fillna(0) did
+    vals = np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").fillna(0.0).to_numpy() for c in value_cols
+    ])[keep]
+
+    hs6, row = np.unique(codes[keep], return_inverse=True)
+    years, col = np.unique(col_years, return_inverse=True)
+    values = np.zeros((len(hs6), len(years)), dtype=vals.dtype)
+    np.add.at(values, (row[:, None], col[None, :]), vals)
+
+    if label_col is not None:
+        labels = df[label_col].to_numpy(dtype=object)[keep]
+        labels = pd.Series(labels).groupby(row).first().reindex(range(len(hs6))).to_numpy(dtype=object)
+    else:
+        labels = np.full(len(hs6), np.nan, dtype=object)
+    return ValueMatrix(hs6, years, values, labels)
+
+
+def rca_table(reporter: ValueMatrix, world: ValueMatrix, name: str = "italy", eps: float = EPS) -> pd.DataFrame:
+    """Long RCA / RSCA table for every reporter code in the years both matrices cover."""
+    years = np.intersect1d(reporter.years, world.years)
+    x_r = reporter.values[:, np.searchsorted(reporter.years, years)]
+    w_all = world.values[:, np.searchsorted(world.years, years)]
+
+    # world values on the reporter's HS6 index; codes the world table lacks get 0
+    pos, found = lookup(world.hs6, reporter.hs6)
+    if found.all():
+        x_w = w_all[pos]
+    else:
+        x_w = np.zeros(x_r.shape, dtype=np.result_type(w_all.dtype, np.float64))
+        x_w[found] = w_all[pos[found]]
+
+    X_r = x_r.sum(axis=0)
+    X_w = w_all.sum(axis=0)
+    rca = ((x_r + eps) / (X_r + eps)) / ((x_w + eps) / (X_w + eps))
+    rsca = (rca - 1) / (rca + 1)
+
+    n, y = x_r.shape
+    out = pd.DataFrame({
+        "year": np.repeat(years, n),
+        "hs6": np.tile(reporter.hs6, y),
+        "product_label": np.tile(reporter.labels, y),
+        f"x_{name}": x_r.T.ravel(),
+        "x_world": x_w.T.ravel(),
+        f"X_{name}": np.repeat(X_r, n),
+        "X_world": np.repeat(X_w, n),
+        "RCA": rca.T.ravel(),
+        "RSCA": rsca.T.ravel(),
+    })
+    out["RSCA_1d"] = out["RSCA"].round(1)
+    return out
+
+
+# ---------------- many reporters at once ----------------
+def rca_block(values: np.ndarray, share_w: np.ndarray, eps: float = EPS):
+    """
+    RCA / RSCA for a block of reporters.
+
+    values:  (reporters, hs6, years) on the world's HS6 index and years
+    share_w: (hs6, years) world share, (x_w + eps) / (X_w + eps)
+    Returns (X_reporter (reporters, years), RCA, RSCA).
+    """
+    X_r = values.sum(axis=1)
+    rca = ((values + eps) / (X_r[:, None, :] + eps)) / share_w[None, :, :]
+    rsca = (rca - 1) / (rca + 1)
+    return X_r, rca, rsca
+
+
+def multi_reporter_rca(root: str, reporters=None, years=None, chunk: int = 32, eps: float = EPS):
+    """
+    Yield long RCA tables for every reporter in the Parquet store, `chunk`
+    reporters at a time.
+
+    Each reporter's "list of exported products" (partner=World) is placed
+    on one HS6 index shared with the world table, so a chunk is a single
+    (chunk, hs6, years) array and memory stays bounded by the chunk size.
+    Rows are emitted for the codes a reporter lists, in the years its own
+    table covers (as italy.py does for Italy), ordered reporter, year, hs6.
+    """
+    from .store import WORLD, list_reporters, open_store, read_long
+
+    store = open_store(root)
+    reporters = list(reporters or list_reporters(store))
+    world = read_long(store, WORLD, WORLD, years)
+    if world.empty:
+        raise ValueError(f"No world table (reporter=World, partner=World) in {root}")
+    year_index = np.unique(world["year"].to_numpy(dtype=np.int64))
+    hs6 = np.unique(read_long(store, partner=WORLD, years=year_index, columns=["hs6"])["hs6"].to_numpy())
+    shape = (len(hs6), len(year_index))
+
+    def cells(long):
+        # flat (hs6, year) positions on the shared index
+        return np.ravel_multi_index(
+            (np.searchsorted(hs6, long["hs6"].to_numpy()), np.searchsorted(year_index, long["year"].to_numpy())),
+            shape,
+        )
+
+    w = np.bincount(cells(world), weights=world["value"].to_numpy(), minlength=shape[0] * shape[1]).reshape(shape)
+    X_w = w.sum(axis=0)
+    share_w = (w + eps) / (X_w + eps)
+
+    for start in range(0, len(reporters), chunk):
+        block = reporters[start:start + chunk]
+        long = read_long(store, block, WORLD, year_index, columns=["reporter", "hs6", "year", "value"])
+        rep = long["reporter"].cat
+        r = pd.Index(block).get_indexer(rep.categories)[rep.codes.to_numpy()]
+        flat = cells(long)
+        size = shape[0] * shape[1]
+        values = np.bincount(
+            r * size + flat, weights=long["value"].to_numpy(), minlength=len(block) * size
+        ).reshape((len(block),) + shape)
+        listed = np.zeros((len(block), len(hs6)), dtype=bool)
+        listed[r, flat // shape[1]] = True
+        has_year = np.zeros((len(block), len(year_index)), dtype=bool)
+        has_year[r, flat % shape[1]] = True
+
+        X_r, rca, rsca = rca_block(values, share_w, eps)
+
+        # listed codes x the years the reporter has, in reporter / year / hs6 order
+        keep = has_year[:, :, None] & listed[:, None, :]
+        ri, yi, hi = np.nonzero(keep)
+
+        def pick(a):
+            return a.transpose(0, 2, 1)[keep]
+
+        out = pd.DataFrame({
+            "reporter": pd.Categorical.from_codes(ri, block),
+            "year": year_index[yi],
+            "hs6": hs6[hi],
+            "x_reporter": pick(values),
+            "x_world": w.T[yi, hi],
+            "X_reporter": X_r[ri, yi],
+            "X_world": X_w[yi],
+            "RCA": pick(rca),
+            "RSCA": pick(rsca),
+        })
+        out["RSCA_1d"] = out["RSCA"].round(1)
+        yield out
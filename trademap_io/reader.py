@@ -0,0 +1,225 @@
+"""
+Streaming reader for TradeMap ".xls" exports.
+
+TradeMap "Excel" downloads are HTML pages with a handful of small layout
+tables around one big product table. `pd.read_html` builds a DataFrame for
+every table on the page and the scripts then kept only the longest one.
+This reader streams the file once with lxml's iterparse, keeps the rows of
+the longest table seen so far and drops every other table (and every parsed
+element) as soon as it closes, so peak memory is bounded by the table we
+keep. Numeric columns come out typed, the way read_html would infer them.
+"""
+import codecs
+import re
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from .cache import cached_table
+from .sniff import sniff_file
+
+DEFAULT_ENCODINGS = ("utf-8", "latin-1", "cp1252")
+
+# same strings pd.read_html turns into NaN
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+}
+
+_LIBXML_NAMES = {
+    "utf-8-sig": "utf-8",
+    "utf-16-le": "UTF-16LE",
+    "utf-16-be": "UTF-16BE",
+    "utf-32-le": "UTF-32LE",
+    "utf-32-be": "UTF-32BE",
+}
+
+_WS = re.compile(r"[\s\xa0]+")
+_INT = re.compile(r"^[+-]?\d+$")
+_LEADING_ZERO = re.compile(r"^0\d")
+_THOUSANDS = re.compile(r"^[+-]?\d{1,3}(,\d{3})+(\.\d+)?$")
+
+
+def _span(el, name: str) -> int:
+    v = el.get(name)
+    if v is None:
+        return 1
+    try:
+        return max(int(v.strip()), 1)
+    except ValueError:
+        return 1
+
+
+def _iter_tables(path: str, encoding: str):
+    """Yields (rows, header_flags) for every <table>, innermost first, as each one closes."""
+    stack = []
+    events = etree.iterparse(
+        path, events=("start", "end"), tag=("table", "tr"),
+        html=True, encoding=encoding, recover=True,
+    )
+    for event, el in events:
+        if el.tag == "table":
+            if event == "start":
+                stack.append(([], []))
+                continue
+            if stack:
+                yield stack.pop()
+        elif event == "end" and stack:
+            cells = [
+                (_WS.sub(" ", "".join(c.itertext())).strip(), c.tag == "th",
+                 _span(c, "colspan"), _span(c, "rowspan"))
+                for c in el if c.tag in ("td", "th")
+            ]
+            if cells:
+                rows, header = stack[-1]
+                rows.append(cells)
+                parent = el.getparent()
+                header.append((parent is not None and parent.tag == "thead") or all(c[1] for c in cells))
+        else:
+            continue
+        # free what has been consumed so the tree never holds more than one row
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+
+
+def _expand_spans(rows):
+    # colspan/rowspan are repeated into every covered cell, as pd.read_html does
+    out = []
+    pending = []  # (col index, text, rows left)
+    for row in rows:
+        texts = []
+        carry = []
+        idx = 0
+        for text, _, colspan, rowspan in row:
+            while pending and pending[0][0] <= idx:
+                _, ptext, left = pending.pop(0)
+                texts.append(ptext)
+                if left > 1:
+                    carry.append((idx, ptext, left - 1))
+                idx += 1
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    carry.append((idx, text, rowspan - 1))
+                idx += 1
+        for _, ptext, left in pending:
+            texts.append(ptext)
+            if left > 1:
+                carry.append((len(texts) - 1, ptext, left - 1))
+        out.append(texts)
+        pending = carry
+    return out
+
+
+def _text_column(values: list) -> pd.Series:
+    # read_html drops thousands separators from number-looking text cells too
+    return pd.Series(
+        [np.nan if v is None else (v.replace(",", "") if _THOUSANDS.match(v) else v) for v in values],
+        dtype=object,
+    )
+
+
+def _typed_column(values: list) -> pd.Series:
+    present = [v for v in values if v is not None]
+    if not present:
+        return pd.Series(np.full(len(values), np.nan))
+    cleaned = [v.replace(",", "") for v in present]
+    if any(_LEADING_ZERO.match(v) for v in cleaned):
+        # zero-padded codes stay text
+        return _text_column(values)
+    try:
+        nums = np.array(cleaned, dtype=np.float64)
+    except ValueError:
+        return _text_column(values)
+    if len(present) == len(values) and all(_INT.match(v) for v in cleaned):
+        return pd.Series(nums.astype(np.int64))
+    out = np.full(len(values), np.nan)
+    out[[i for i, v in enumerate(values) if v is not None]] = nums
+    return pd.Series(out)
+
+
+def _rows_to_frame(rows: list, header: list) -> pd.DataFrame:
+    grid = _expand_spans(rows)
+    n_head = 0
+    while n_head < len(grid) and header[n_head]:
+        n_head += 1
+    if n_head == len(grid):
+        # a table made only of <th> rows is data, not header
+        n_head = 0
+    width = max(len(r) for r in grid)
+    grid = [r + [""] * (width - len(r)) for r in grid]
+
+    head, body = grid[:n_head], grid[n_head:]
+    if head:
+        # multi-row headers are joined "top | sub" (what fix_header_two_rows does)
+        names = []
+        for parts in zip(*head):
+            kept = []
+            for p in parts:
+                if p and p not in kept:
+                    kept.append(p)
+            names.append(" | ".join(kept))
+    else:
+        names = list(range(width))
+
+    cols = {}
+    for j in range(width):
+        cols[j] = _typed_column([None if r[j] in NA_VALUES else r[j] for r in body])
+    df = pd.DataFrame(cols)
+    df.columns = names
+    return df
+
+
+def _libxml_encoding(encoding: str) -> str:
+    # libxml2 does not know several Python codec aliases ("latin-1", "utf-16-le", ...)
+    name = codecs.lookup(encoding).name
+    return _LIBXML_NAMES.get(name, name)
+
+
+def parse_main_table(path: str, encoding: str = "utf-8") -> pd.DataFrame | None:
+    """Stream one file; returns the longest table or None if there is none."""
+    best = None
+    for rows, header in _iter_tables(path, _libxml_encoding(encoding)):
+        # ties keep the first table, like max(tables, key=...)
+        if rows and (best is None or len(rows) > len(best[0])):
+            best = (rows, header)
+    if best is None:
+        return None
+    return _rows_to_frame(*best)
+
+
+def read_trademap_table(path: str, encodings=None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Main product table of a TradeMap HTML export (replaces read_html + max).
+
+    Without `encodings` the file's sniffed encoding is used (see sniff.py);
+    a list of encodings is tried in order, as the old readers did.
+    """
+    if encodings is None:
+        encodings = (sniff_file(path)["encoding"] or DEFAULT_ENCODINGS[0],)
+
+    def parse(p):
+        for enc in encodings:
+            df = parse_main_table(p, enc)
+            if df is not None:
+                return df
+        raise RuntimeError(f"Cannot parse HTML tables: {p}")
+
+    if not use_cache:
+        return parse(path)
+    return cached_table(path, "html:" + ",".join(encodings), parse)
+
+
+def read_trademap_file(path: str) -> pd.DataFrame:
+    """Main table of any TradeMap download, read once with the sniffed engine."""
+    info = sniff_file(path)
+    if info["format"] == "html":
+        return read_trademap_table(path, encodings=(info["encoding"],))
+
+    def read_excel(p):
+        return pd.read_excel(p, engine=info["engine"])
+
+    return cached_table(path, f"excel:{info['engine']}", read_excel)
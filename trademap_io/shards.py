@@ -0,0 +1,81 @@
+"""
+Sharded metric runs for many partners.
+
+The partner list is cut into fixed-size shards. A shard is computed on
+its own (a separate process or machine can run each one) and only its
+per-partner results are kept: step1 rows, exported stable code arrays,
+coverage rows. Those are a few KB per partner, whatever the size of the
+partner files, so memory stays flat as the partner count grows. Merging
+concatenates the shard results in plan order and runs the usual
+finalize, so the merged outputs are the ones a single run over all
+partners would write.
+
+    <shard_dir>/plan.json        metrics, shard size and the partner -> file shards
+    <shard_dir>/shard_0003.pkl   one shard's per-partner results
+"""
+import json
+import os
+import pickle
+
+from .config import BASE_DIR
+from .metrics import compute_metrics, finalize_metrics
+
+SHARD_DIR = os.path.join(BASE_DIR, "shards")
+
+
+def make_shards(partner_files: dict, size: int) -> list:
+    """Consecutive {partner: file} dicts of at most `size` partners."""
+    items = list(partner_files.items())
+    return [dict(items[i:i + size]) for i in range(0, len(items), max(size, 1))]
+
+
+def write_plan(shard_dir: str, names, partner_files: dict, size: int) -> dict:
+    os.makedirs(shard_dir, exist_ok=True)
+    plan = {"metrics": list(names), "shard_size": size, "shards": make_shards(partner_files, size)}
+    with open(os.path.join(shard_dir, "plan.json"), "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+    return plan
+
+
+def read_plan(shard_dir: str) -> dict:
+    path = os.path.join(shard_dir, "plan.json")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No shard plan in {shard_dir}; run run_shards.py --plan-only (or without --shard) first")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def shard_path(shard_dir: str, i: int) -> str:
+    return os.path.join(shard_dir, f"shard_{i:04d}.pkl")
+
+
+def run_shard(shard_dir: str, i: int, stable, base_dir: str = BASE_DIR, jobs: int = 1,
+              dataset: str = None, years=None, cube: str = None) -> str:
+    """Compute shard i of the plan and save its per-partner results."""
+    plan = read_plan(shard_dir)
+    partner_files = plan["shards"][i]
+    per_partner = compute_metrics(plan["metrics"], partner_files, stable, base_dir, jobs, dataset, years, cube)
+    path = shard_path(shard_dir, i)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"partners": list(partner_files), "results": per_partner}, f)
+    os.replace(tmp, path)
+    return path
+
+
+def merge_shards(shard_dir: str, stable) -> dict:
+    """{output file name: DataFrame} over every shard of the plan."""
+    plan = read_plan(shard_dir)
+    missing = [i for i in range(len(plan["shards"])) if not os.path.exists(shard_path(shard_dir, i))]
+    if missing:
+        raise FileNotFoundError(f"Shards not computed yet: {missing}")
+
+    partners, per_partner = [], []
+    for i, shard in enumerate(plan["shards"]):
+        with open(shard_path(shard_dir, i), "rb") as f:
+            done = pickle.load(f)
+        if done["partners"] != list(shard):
+            raise ValueError(f"{shard_path(shard_dir, i)} does not match the plan; rerun shard {i}")
+        partners += done["partners"]
+        per_partner += done["results"]
+    return finalize_metrics(plan["metrics"], partners, per_partner, stable)
@@ -0,0 +1,141 @@
+"""
+Format sniffing for TradeMap downloads.
+
+A ".xls" from TradeMap may be a real BIFF workbook, an OOXML workbook or
+(most often) an HTML page. Instead of trying every Excel engine and then
+every encoding, `sniff_file` looks at the magic bytes, BOM and declared
+charset once and `reader.read_trademap_file` goes straight to the right
+reader.
+HTML that declares no encoding (no BOM, no charset) is checked as UTF-8
+over the whole file and read as cp1252 when it is not valid UTF-8, the
+fallback of the old readers. Each decision (and where the encoding came
+from) is recorded in a small per-file manifest (keyed by path, size and
+mtime) so later runs do not even re-read the header bytes.
+"""
+import codecs
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from .cache import cache_dir
+
+HEAD_BYTES = 4096
+SCAN_CHUNK = 1 << 20
+FALLBACK_ENCODING = "cp1252"
+
+_MAGIC = [
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "xls", "xlrd"),  # OLE2 / BIFF
+    (b"PK\x03\x04", "xlsx", "openpyxl"),                    # OOXML zip
+]
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+_CHARSET = re.compile(rb"""charset\s*=\s*["']?\s*([A-Za-z0-9_.:\-]+)""", re.I)
+_XML_ENCODING = re.compile(rb"""<\?xml[^>]*encoding\s*=\s*["']([A-Za-z0-9_.:\-]+)""", re.I)
+
+
+def _known_encoding(name: bytes) -> str | None:
+    try:
+        return codecs.lookup(name.decode("ascii")).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+
+
+def _utf8_or_fallback(chunks, final: bool) -> str:
+    """
+    "utf-8" if the byte chunks decode as UTF-8, else cp1252. With final=False the
+    chunks are only the start of the file and a character cut at the end is fine.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in chunks:
+            decoder.decode(chunk)
+        decoder.decode(b"", final=final)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def sniff_bytes(head: bytes) -> dict:
+    """Format/engine/encoding decision from the first bytes of a file."""
+    for magic, fmt, engine in _MAGIC:
+        if head.startswith(magic):
+            return {"format": fmt, "engine": engine, "encoding": None, "encoding_from": "magic"}
+
+    for bom, enc in _BOMS:
+        if head.startswith(bom):
+            return {"format": "html", "engine": "lxml", "encoding": enc, "encoding_from": "bom"}
+
+    # UTF-16 without BOM: every other byte of the ASCII markup is NUL
+    if head[:2] == b"<\x00":
+        return {"format": "html", "engine": "lxml", "encoding": "utf-16-le", "encoding_from": "nul-bytes"}
+    if head[:2] == b"\x00<":
+        return {"format": "html", "engine": "lxml", "encoding": "utf-16-be", "encoding_from": "nul-bytes"}
+
+    for pat in (_CHARSET, _XML_ENCODING):
+        m = pat.search(head)
+        if m:
+            enc = _known_encoding(m.group(1))
+            if enc:
+                return {"format": "html", "engine": "lxml", "encoding": enc, "encoding_from": "charset"}
+
+    # undeclared: UTF-8 if the bytes are valid UTF-8, else the old readers' cp1252 fallback
+    # (a head shorter than HEAD_BYTES is the whole file; sniff_file checks longer files to the end)
+    encoding = _utf8_or_fallback([head], final=len(head) < HEAD_BYTES)
+    return {"format": "html", "engine": "lxml", "encoding": encoding, "encoding_from": "guess"}
+
+
+def _file_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(SCAN_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _manifest_path(path: str) -> str:
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(cache_dir(), "manifest", name + ".json")
+
+
+def sniff_file(path: str) -> dict:
+    """sniff_bytes for a file, remembered in its manifest until the file changes."""
+    st = os.stat(path)
+    mpath = _manifest_path(path)
+    try:
+        with open(mpath, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        # entries written before encoding_from existed may hold an unchecked utf-8 guess
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns and "encoding_from" in entry:
+            return entry
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+    entry = {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        **sniff_bytes(head),
+    }
+    if entry["encoding_from"] == "guess" and entry["encoding"] == "utf-8" and st.st_size > len(head):
+        entry["encoding"] = _utf8_or_fallback(_file_chunks(path), final=True)
+    if entry["encoding"] == FALLBACK_ENCODING:
+        print(f"WARNING: {path} declares no encoding and is not valid UTF-8; reading it as {FALLBACK_ENCODING}")
+    try:
+        os.makedirs(os.path.dirname(mpath), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(mpath), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp, mpath)
+    except OSError as e:
+        print(f"WARNING: manifest not written for {path}: {e}")
+    return entry
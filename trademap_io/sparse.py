@@ -0,0 +1,181 @@
+"""
+Sparse partner x HS6 x year export values.
+
+Only the non-zero cells are kept, CSR-style with one row per partner:
+
+    indptr         (partners + 1,)  row p is entries indptr[p]:indptr[p + 1]
+    code, year     positions on the hs6 / years index of every entry
+    value          the export value (float64)
+    listed_indptr  the same row layout for the codes listed in the partner
+    listed_code    file (value 0 in every year included)
+    listed_years   (partners, years) bool, the years each partner file has
+
+so a small destination costs its own number of entries rather than a
+full HS6 x year block. Shares and coverage reduce over the entries
+(bincount over partner x year, packed presence from the (partner, code)
+pairs); `view` expands one partner's listed codes only, which is what the
+--cube metrics consume. Saved as one compressed .npz (see build_cube.py
+--sparse).
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .hs6 import format_hs6, lookup
+from .presence import PresenceMatrix
+
+try:
+    from scipy import sparse
+except ImportError:  # to_csr() / profiles() need scipy; everything else is NumPy
+    sparse = None
+
+
+class SparseValues(NamedTuple):
+    partners: list
+    hs6: np.ndarray            # sorted uint32 codes
+    years: np.ndarray          # int16
+    indptr: np.ndarray         # (partners + 1,) int64
+    code: np.ndarray           # int32 positions on hs6
+    year: np.ndarray           # int16 positions on years
+    value: np.ndarray          # float64
+    listed_indptr: np.ndarray  # (partners + 1,) int64
+    listed_code: np.ndarray    # int32 positions on hs6, sorted within a partner
+    listed_years: np.ndarray   # (partners, years) bool
+
+    def partner_index(self, partner: str) -> int:
+        return self.partners.index(partner)
+
+    @property
+    def density(self) -> float:
+        cells = len(self.partners) * len(self.hs6) * len(self.years)
+        return len(self.value) / cells if cells else 0.0
+
+    def rows(self) -> np.ndarray:
+        """Partner position of every entry."""
+        return np.repeat(np.arange(len(self.partners)), np.diff(self.indptr))
+
+    def year_totals(self, code_mask: np.ndarray = None) -> np.ndarray:
+        """(partners, years) value totals, over all codes or the codes where `code_mask` (on hs6) is True."""
+        keep = slice(None) if code_mask is None else code_mask[self.code]
+        flat = self.rows()[keep] * len(self.years) + self.year[keep]
+        return np.bincount(
+            flat, weights=self.value[keep], minlength=len(self.partners) * len(self.years)
+        ).reshape(len(self.partners), len(self.years))
+
+    def presence(self, index: np.ndarray) -> PresenceMatrix:
+        """Packed partner x `index` presence (value > 0 in any year) for a sorted code index."""
+        positive = self.value > 0
+        pos, found = lookup(index, self.hs6[self.code[positive]])
+        present = np.zeros((len(self.partners), len(index)), dtype=bool)
+        present[self.rows()[positive][found], pos[found]] = True
+        return PresenceMatrix.from_dense(self.partners, index, present)
+
+    def view(self, p: int):
+        """(listed codes, values (listed, years)) for partner position p, dense over its listed codes only."""
+        listed = self.listed_code[self.listed_indptr[p]:self.listed_indptr[p + 1]]
+        s = slice(self.indptr[p], self.indptr[p + 1])
+        values = np.zeros((len(listed), len(self.years)), dtype=np.float64)
+        values[np.searchsorted(listed, self.code[s]), self.year[s]] = self.value[s]
+        return self.hs6[listed], values
+
+    def to_csr(self):
+        """scipy CSR matrix, partners x (hs6 * years), column = code * years + year."""
+        if sparse is None:
+            raise ImportError("to_csr() needs scipy")
+        cols = self.code.astype(np.int64) * len(self.years) + self.year
+        return sparse.csr_matrix(
+            (self.value, cols, self.indptr), shape=(len(self.partners), len(self.hs6) * len(self.years))
+        )
+
+    def profiles(self, kind: str = "presence", code_mask: np.ndarray = None):
+        """
+        scipy CSR partners x hs6 absorption profiles over all years:
+          presence  1 where the partner imports the code (value > 0 in any year)
+          share     the code's share of the partner's total value
+        `code_mask` (on hs6) keeps only some columns (e.g. the stable core).
+        """
+        if sparse is None:
+            raise ImportError("profiles() needs scipy")
+        shape = (len(self.partners), len(self.hs6))
+        # (partner, code) sums over the years; csr_matrix adds up the duplicates
+        m = sparse.csr_matrix((self.value, (self.rows(), self.code)), shape=shape)
+        m.sum_duplicates()
+        if kind == "presence":
+            m = (m > 0).astype(np.float64)
+        elif kind == "share":
+            totals = np.asarray(m.sum(axis=1)).ravel()
+            with np.errstate(divide="ignore"):
+                m = sparse.diags(np.where(totals > 0, 1.0 / totals, 0.0)) @ m
+        else:
+            raise ValueError(f"Unknown profile kind {kind!r}; use 'presence' or 'share'")
+        m = sparse.csr_matrix(m)
+        if code_mask is not None:
+            m = m[:, np.flatnonzero(code_mask)]
+        m.eliminate_zeros()
+        return m
+
+    def edges(self) -> pd.DataFrame:
+        """Long edge list: partner, hs6, year, value (non-zero cells only)."""
+        return pd.DataFrame({
+            "partner": pd.Categorical.from_codes(self.rows(), self.partners),
+            "hs6": format_hs6(self.hs6[self.code]),
+            "year": self.years[self.year].astype(np.int64),
+            "value": self.value,
+        })
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, partners=np.array(self.partners, dtype=str), **{
+            name: getattr(self, name) for name in self._fields if name != "partners"
+        })
+
+
+def load_sparse(path: str) -> SparseValues:
+    with np.load(path) as z:
+        partners = [str(p) for p in z["partners"]]
+        arrays = {name: z[name] for name in SparseValues._fields if name != "partners" and name in z.files}
+    # files saved before listed_years: every partner has every year
+    arrays.setdefault("listed_years", np.ones((len(partners), len(arrays["years"])), dtype=bool))
+    return SparseValues(partners, **arrays)
+
+
+def build_sparse_from_store(root: str, partners=None, years=None) -> SparseValues:
+    """
+    Sparse values for reporter=Italy from the Parquet store, one partner at a time.
+    The year axis is every year partition stored for the partners (years added with
+    append_year.py included) unless `years` is given.
+    """
+    from .store import list_partners, list_years, open_store, read_long
+
+    store = open_store(root)
+    partners = partners or list_partners(store)
+    years = np.asarray(years or list_years(store, "Italy", partners), dtype=np.int16)
+    longs = [read_long(store, "Italy", p, years, columns=["hs6", "year", "value"]) for p in partners]
+    hs6 = np.unique(np.concatenate([l["hs6"].to_numpy(dtype=np.uint32) for l in longs] or [[]])).astype(np.uint32)
+
+    indptr, listed_indptr = [0], [0]
+    code, year, value, listed_code = [], [], [], []
+    listed_years = np.zeros((len(partners), len(years)), dtype=bool)
+    for i, long in enumerate(longs):
+        h = np.searchsorted(hs6, long["hs6"].to_numpy(dtype=np.uint32))
+        y = np.searchsorted(years, long["year"].to_numpy(dtype=np.int16))
+        # duplicate (code, year) rows are summed, zero cells dropped
+        cells, inv = np.unique(h.astype(np.int64) * len(years) + y, return_inverse=True)
+        v = np.bincount(inv, weights=long["value"].to_numpy(), minlength=len(cells))
+        nz = v != 0
+        code.append((cells[nz] // len(years)).astype(np.int32))
+        year.append((cells[nz] % len(years)).astype(np.int16))
+        value.append(v[nz])
+        listed_code.append(np.unique(h).astype(np.int32))
+        listed_years[i, y] = True
+        indptr.append(indptr[-1] + int(nz.sum()))
+        listed_indptr.append(listed_indptr[-1] + len(listed_code[-1]))
+
+    def cat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    return SparseValues(
+        list(partners), hs6, years, np.array(indptr, dtype=np.int64),
+        cat(code, np.int32), cat(year, np.int16), cat(value, np.float64),
+        np.array(listed_indptr, dtype=np.int64), cat(listed_code, np.int32), listed_years,
+    )
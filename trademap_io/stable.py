@@ -0,0 +1,184 @@
+"""
+Stable comparative-advantage core from the italy.py RSCA table.
+
+The per-year RSCA values are put once on an HS6 x year matrix and every
+HS6 row is sorted descending. "RSCA > t in at least m years" is then the
+same as "the m-th largest RSCA > t", so any (threshold, min years) pair,
+or a whole grid of them, is a single column comparison on the sorted
+matrix; the long table is never revisited.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .hs6 import INVALID, encode_hs6, format_hs6
+
+DEFAULT_THRESHOLD = 0.0
+DEFAULT_MIN_YEARS = 3
+GRID_THRESHOLDS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5]
+GRID_MIN_YEARS = list(range(1, 13))
+WINDOWS = list(range(3, 13))
+
+
+class StableStats(NamedTuple):
+    hs6: np.ndarray       # sorted codes (uint32)
+    labels: np.ndarray
+    years: np.ndarray
+    rsca: np.ndarray      # (hs6, years), NaN where the year is missing
+    ranked: np.ndarray    # each row sorted descending, NaN last
+    avg_rsca: np.ndarray  # mean over the years present
+
+
+def stable_stats(rsca_long: pd.DataFrame) -> StableStats:
+    """Stats from a long year / hs6 / RSCA table (italy.py output or rca_table)."""
+    codes = encode_hs6(rsca_long["hs6"])
+    keep = codes != INVALID
+    long = rsca_long.loc[keep]
+    hs6, row = np.unique(codes[keep], return_inverse=True)
+    years, col = np.unique(long["year"].to_numpy(dtype=np.int64), return_inverse=True)
+
+    rsca = np.full((len(hs6), len(years)), np.nan)
+    rsca[row, col] = long["RSCA"].to_numpy(dtype=np.float64)
+    labels = None
+    if "product_label" in long.columns:
+        labels = pd.Series(long["product_label"].to_numpy(dtype=object)).groupby(row).first()
+        labels = labels.reindex(range(len(hs6))).to_numpy(dtype=object)
+    return stats_from_matrix(hs6, years, rsca, labels)
+
+
+def stats_from_matrix(hs6: np.ndarray, years: np.ndarray, rsca: np.ndarray, labels=None) -> StableStats:
+    """Stats from an (hs6, years) RSCA matrix on sorted codes, NaN where the year is missing."""
+    if labels is None:
+        labels = np.full(len(hs6), np.nan, dtype=object)
+    # -inf sorts NaN (missing years) after every real value
+    ranked = -np.sort(-np.nan_to_num(rsca, nan=-np.inf), axis=1)
+    ranked[np.isinf(ranked)] = np.nan
+    with np.errstate(invalid="ignore"):
+        avg = np.nanmean(rsca, axis=1)
+    return StableStats(hs6, labels, years, rsca, ranked, avg)
+
+
+def years_above(stats: StableStats, threshold: float) -> np.ndarray:
+    """Number of years with RSCA > threshold, per HS6."""
+    return (stats.ranked > threshold).sum(axis=1)
+
+
+def _run_lengths(above: np.ndarray) -> np.ndarray:
+    """(hs6, years): length of the True run ending at each year (0 where False)."""
+    j = np.arange(1, above.shape[1] + 1)
+    last_break = np.maximum.accumulate(np.where(above, 0, j), axis=1)
+    return j - last_break
+
+
+def _above_by_calendar_year(stats: StableStats, threshold: float):
+    """(calendar years min..max, (hs6, calendar years) RSCA > threshold); years missing from the table are False."""
+    years = np.arange(stats.years.min(), stats.years.max() + 1)
+    above = np.zeros((len(stats.hs6), len(years)), dtype=bool)
+    above[:, np.searchsorted(years, stats.years)] = stats.rsca > threshold
+    return years, above
+
+
+def longest_run(stats: StableStats, threshold: float) -> np.ndarray:
+    """Longest run of consecutive calendar years with RSCA > threshold, per HS6 (a missing year breaks it)."""
+    if stats.rsca.shape[1] == 0:
+        return np.zeros(len(stats.hs6), dtype=np.int64)
+    return _run_lengths(_above_by_calendar_year(stats, threshold)[1]).max(axis=1)
+
+
+def window_stability(stats: StableStats, windows=WINDOWS, threshold: float = DEFAULT_THRESHOLD) -> pd.DataFrame:
+    """
+    Windowed stability per HS6 on the full year range (missing years count as not positive):
+    max_positive_in_<w>y is the most years with RSCA > threshold in any w consecutive
+    years (so "k of any w" is max_positive_in_<w>y >= k), plus the longest positive
+    spell, the first positive year (entry) and the year after the last positive one
+    (exit; empty while the product is still positive in the last year).
+    """
+    years, above = _above_by_calendar_year(stats, threshold)
+    csum = np.concatenate([np.zeros((len(stats.hs6), 1), dtype=np.int64), above.cumsum(axis=1)], axis=1)
+
+    any_above = above.any(axis=1)
+    first = above.argmax(axis=1)
+    last = len(years) - 1 - above[:, ::-1].argmax(axis=1)
+    exited = any_above & (last < len(years) - 1)
+    out = pd.DataFrame({
+        "hs6": format_hs6(stats.hs6),
+        "product_label": stats.labels,
+        "years_positive": csum[:, -1],
+        "longest_spell": _run_lengths(above).max(axis=1),
+        "entry_year": pd.Series(np.where(any_above, years[first], np.nan)).astype("Int64"),
+        "exit_year": pd.Series(np.where(exited, years[last] + 1, np.nan)).astype("Int64"),
+    })
+    for w in windows:
+        if w <= len(years):
+            out[f"max_positive_in_{w}y"] = (csum[:, w:] - csum[:, :-w]).max(axis=1)
+    return out
+
+
+def _kth_largest(stats: StableStats, min_years) -> np.ndarray:
+    """(hs6, len(min_years)): m-th largest RSCA per HS6 (+inf for m < 1, NaN past the last year)."""
+    min_years = np.asarray(min_years, dtype=np.int64)
+    kth = np.full((len(stats.hs6), len(min_years)), np.nan)
+    ok = (min_years >= 1) & (min_years <= len(stats.years))
+    kth[:, ok] = stats.ranked[:, min_years[ok] - 1]
+    kth[:, min_years < 1] = np.inf
+    return kth
+
+
+def core_mask(stats: StableStats, threshold: float = DEFAULT_THRESHOLD,
+              min_years: int = DEFAULT_MIN_YEARS) -> np.ndarray:
+    """Bool (hs6,): RSCA > threshold in at least min_years years (one column comparison)."""
+    with np.errstate(invalid="ignore"):
+        return _kth_largest(stats, [min_years])[:, 0] > threshold
+
+
+def _table(stats: StableStats, mask, counts, runs) -> pd.DataFrame:
+    # stable-file layout; codes become zero-padded strings only here
+    return pd.DataFrame({
+        "hs6": format_hs6(stats.hs6[mask]),
+        "product_label": stats.labels[mask],
+        "years_positive": counts[mask],
+        "longest_run": runs[mask],
+        "avg_rsca": stats.avg_rsca[mask],
+    })
+
+
+def stable_core(stats: StableStats, threshold: float = DEFAULT_THRESHOLD,
+                min_years: int = DEFAULT_MIN_YEARS) -> pd.DataFrame:
+    """HS6 with RSCA > threshold in at least min_years years (years_positive counts those years)."""
+    return stable_grid(stats, [threshold], [min_years])[(float(threshold), int(min_years))]
+
+
+def stable_grid(stats: StableStats, thresholds=GRID_THRESHOLDS, min_years=GRID_MIN_YEARS) -> dict:
+    """{(threshold, min_years): stable table} for the whole grid in one comparison."""
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    min_years = np.asarray(min_years, dtype=np.int64)
+    with np.errstate(invalid="ignore"):
+        masks = _kth_largest(stats, min_years).T[None, :, :] > thresholds[:, None, None]  # (t, m, hs6)
+    grid = {}
+    for i, t in enumerate(thresholds):
+        counts, runs = years_above(stats, t), longest_run(stats, t)
+        for j, m in enumerate(min_years):
+            grid[(float(t), int(m))] = _table(stats, masks[i, j], counts, runs)
+    return grid
+
+
+def grid_file_name(threshold: float, min_years: int) -> str:
+    # repr keeps every decimal (0.25 -> gt0p25) so distinct thresholds never share a file;
+    # only the threshold's own dot becomes "p" (1e-05 has none)
+    t = repr(float(threshold)).replace(".", "p")
+    return f"stable_rsca_gt{t}_min{min_years}years.csv"
+
+
+def write_grid(grid: dict, out_dir: str) -> pd.DataFrame:
+    """One CSV per grid cell plus stable_grid_summary.csv (cell -> HS6 count)."""
+    os.makedirs(out_dir, exist_ok=True)
+    rows = []
+    for (t, m), table in grid.items():
+        fname = grid_file_name(t, m)
+        table.to_csv(os.path.join(out_dir, fname), index=False)
+        rows.append({"threshold": t, "min_years": m, "stable_hs6": len(table), "file": fname})
+    summary = pd.DataFrame(rows)
+    summary.to_csv(os.path.join(out_dir, "stable_grid_summary.csv"), index=False)
+    return summary
@@ -0,0 +1,147 @@
+"""
+Partitioned Parquet store for every TradeMap input.
+
+All files (the Italy and world "list of exported products" tables and the
+Italy -> partner tables) are ingested into one long dataset, partitioned
+hive-style by reporter / partner / year:
+
+    <root>/reporter=Italy/partner=Germany/year=2013/part-0.parquet
+
+with a fixed schema (hs6 uint32, value float64, dictionary-encoded label).
+Readers pass partition filters and a column list, so e.g. step1 for one
+partner and one year only opens that partition's row groups.
+
+Conventions: the Italy file is reporter=Italy, partner=World; the world
+file is reporter=World, partner=World; partner files are reporter=Italy,
+partner=<name>.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from .tables import year_columns
+
+SCHEMA = pa.schema([
+    ("hs6", pa.uint32()),
+    ("label", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.float64()),
+    ("reporter", pa.string()),
+    ("partner", pa.string()),
+    ("year", pa.int16()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([("reporter", pa.string()), ("partner", pa.string()), ("year", pa.int16())]),
+    flavor="hive",
+)
+WORLD = "World"
+
+
+def frame_to_table(frame: pd.DataFrame, reporter: str, partner: str) -> pa.Table:
+    """Canonical wide frame -> long Arrow table in SCHEMA."""
+    years = year_columns(frame)
+    n = len(frame)
+    hs6 = frame["hs6"].astype(np.uint32).to_numpy()
+    order = np.argsort(hs6, kind="stable")
+    labels = frame["label"].fillna("").astype(str).to_numpy()[order]
+    return pa.table({
+        "hs6": pa.array(np.tile(hs6[order], len(years)), pa.uint32()),
+        "label": pa.array(np.tile(labels, len(years))).dictionary_encode(),
+        "value": pa.array(frame[years].to_numpy(dtype=np.float64)[order].T.ravel()),
+        "reporter": pa.array([reporter] * (n * len(years)), pa.string()),
+        "partner": pa.array([partner] * (n * len(years)), pa.string()),
+        "year": pa.array(np.repeat(np.asarray(years, dtype=np.int16), n)),
+    }, schema=SCHEMA)
+
+
+def write_frame(root: str, frame: pd.DataFrame, reporter: str, partner: str) -> None:
+    """Write (or replace) the reporter/partner partitions for one file."""
+    ds.write_dataset(
+        frame_to_table(frame, reporter, partner), root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+
+def open_store(root: str) -> ds.Dataset:
+    return ds.dataset(root, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+
+
+def _match(field: str, value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return pc.field(field).isin(list(value))
+    return pc.field(field) == value
+
+
+def _filter(reporter=None, partner=None, years=None):
+    """Partition filter; reporter / partner may be one name or a list of names."""
+    expr = None
+    for cond in (
+        _match("reporter", reporter),
+        _match("partner", partner),
+        pc.field("year").isin([int(y) for y in years]) if years is not None else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+    return expr
+
+
+def read_long(root, reporter=None, partner=None, years=None, columns=None) -> pd.DataFrame:
+    """Long rows for the selected partitions, reading only `columns` (`root` may be an open store)."""
+    store = root if isinstance(root, ds.Dataset) else open_store(root)
+    table = store.to_table(
+        columns=columns or ["hs6", "year", "value"],
+        filter=_filter(reporter, partner, years),
+    )
+    # reporter / partner repeat on every row: hand them to pandas as categoricals
+    for name in ("reporter", "partner"):
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, pc.dictionary_encode(table.column(name)))
+    return table.to_pandas()
+
+
+def read_frame(root: str, reporter: str, partner: str, years=None) -> pd.DataFrame:
+    """Canonical wide frame (hs6 uint32, label, one column per year) from the store."""
+    long = read_long(root, reporter, partner, years, columns=["hs6", "label", "year", "value"])
+    if long.empty:
+        raise ValueError(f"No rows in {root} for reporter={reporter} partner={partner}")
+    wide = long.pivot_table(index="hs6", columns="year", values="value", aggfunc="sum", fill_value=0.0)
+    wide = wide.sort_index()
+    labels = long.drop_duplicates("hs6").set_index("hs6")["label"].astype(object)
+    out = pd.DataFrame({
+        "hs6": wide.index.to_numpy(dtype=np.uint32),
+        "label": labels.reindex(wide.index).to_numpy(),
+    })
+    for y in wide.columns:
+        out[int(y)] = wide[y].to_numpy(dtype=np.float64)
+    out.attrs.update(partner=partner, years=[int(y) for y in wide.columns], coerced=0)
+    return out
+
+
+def _partition_values(root, key: str, **where) -> set:
+    # from the partition paths alone, no data pages are read
+    store = root if isinstance(root, ds.Dataset) else open_store(root)
+    return {
+        ds.get_partition_keys(frag.partition_expression).get(key)
+        for frag in store.get_fragments(filter=_filter(**where))
+    }
+
+
+def list_partners(root, reporter: str = "Italy") -> list:
+    return sorted(p for p in _partition_values(root, "partner", reporter=reporter) if p != WORLD)
+
+
+def list_reporters(root) -> list:
+    """Reporters with a "list of exported products" table (partner=World), World itself excluded."""
+    return sorted(r for r in _partition_values(root, "reporter", partner=WORLD) if r != WORLD)
+
+
+def list_years(root, reporter: str = "Italy", partner=None) -> list:
+    """Year partitions stored for a reporter (and partner / list of partners), sorted."""
+    return sorted(int(y) for y in _partition_values(root, "year", reporter=reporter, partner=partner))
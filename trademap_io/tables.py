@@ -0,0 +1,169 @@
+"""
+TradeMap table helpers and the canonical frame.
+
+These used to be copy-pasted (with small drifts) into every script. A
+partner or reporter file is now loaded once into a canonical frame: one
+row per valid HS6 code (TOTAL and malformed rows dropped), `hs6` (uint32,
+see hs6.py) and `label` columns and one float64 column per detected year
+(int names).
+
+The years are read from the headers ("Value in 2013", "Exported value in
+2025", ...), not from a fixed range, so a file that gains a year (see
+append_year.py) is read in full; `years` only narrows the selection.
+"""
+import os
+import re
+
+import pandas as pd
+
+from .config import BASE_DIR
+from .hs6 import INVALID, encode_hs6
+from .numbers import to_number_frame
+from .reader import read_trademap_file, read_trademap_table
+
+YEAR_IN_HEADER = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+def normalize_hs6_series(s: pd.Series) -> pd.Series:
+    return (
+        s.astype(str)
+        .str.replace(r"\D", "", regex=True)
+        .str.zfill(6)
+    )
+
+
+def fix_header_two_rows(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Partner files carry their header in the first two table rows, e.g.
+      row0: "Product code", "Product label", "Italy's exports to Germany" ...
+      row1: "Value in 2013" ... "Value in 2024"
+    They are combined into "top | sub" column names and dropped from the data.
+    Tables that do not look like that are returned as-is.
+    """
+    if raw.shape[0] < 3:
+        return raw
+
+    c00 = str(raw.iloc[0, 0]).strip().lower()
+    c01 = str(raw.iloc[0, 1]).strip().lower()
+    if "product code" not in c00 or "product label" not in c01:
+        return raw
+
+    top = raw.iloc[0].astype(str)
+    sub = raw.iloc[1].astype(str)
+
+    new_cols = []
+    for t, s in zip(top, sub):
+        t = str(t).strip()
+        s = str(s).strip()
+        if s.lower() in {"nan", "none"} or s == "":
+            new_cols.append(t)
+        else:
+            new_cols.append(f"{t} | {s}")
+
+    df = raw.iloc[2:].copy()
+    df.columns = new_cols
+    return df.reset_index(drop=True)
+
+
+def find_hs_col(df: pd.DataFrame) -> str:
+    for c in df.columns:
+        if str(c).strip() == "Product code" or str(c).startswith("Product code |"):
+            return c
+    # fallback: the column that looks most like HS6 codes
+    best_col, best_score = None, -1
+    for c in df.columns:
+        score = int((encode_hs6(df[c]) != INVALID).sum())
+        if score > best_score:
+            best_score, best_col = score, c
+    if best_col is None or best_score <= 0:
+        raise ValueError(f"HS column not detected. columns={list(df.columns)}")
+    return best_col
+
+
+def header_year(column):
+    """Year named in a column header ("... Value in 2013" -> 2013), None if there is none."""
+    m = YEAR_IN_HEADER.search(str(column))
+    return int(m.group(1)) if m else None
+
+
+def partner_value_cols(df: pd.DataFrame, partner: str, years=None) -> dict:
+    """year -> column for "Italy's exports to {partner} | Value in {year}" (every year, or only `years`)."""
+    prefix = f"Italy's exports to {partner}".lower()
+    year_to_col = {}
+    for c in df.columns:
+        name = str(c).lower()
+        y = header_year(c)
+        if prefix in name and "value in" in name and y is not None and (years is None or y in years):
+            year_to_col[y] = c
+    return year_to_col
+
+
+def find_col(cols, must_contain):
+    for c in cols:
+        s = str(c).lower()
+        if all(k.lower() in s for k in must_contain):
+            return c
+    return None
+
+
+def guess_year_value_cols(df: pd.DataFrame, years=None):
+    # columns like "Exported value in 2013" ... "Exported value in 2024" (every year, or only `years`)
+    year_cols = []
+    for c in df.columns:
+        s = str(c).lower()
+        y = header_year(c)
+        if ("export" in s) and ("value" in s) and y is not None and (years is None or y in years):
+            year_cols.append(c)
+    return year_cols
+
+
+def _canonical(codes, labels, year_to_col: dict, df: pd.DataFrame) -> pd.DataFrame:
+    # drop TOTAL / invalid
+    keep = codes != INVALID
+    years = sorted(year_to_col)
+    vals, coerced = to_number_frame(df.loc[keep, [year_to_col[y] for y in years]])
+    vals.columns = years
+    label = (labels[keep].astype(object) if labels is not None else pd.Series("", index=df.index[keep]))
+    hs6 = pd.Series(codes[keep], index=df.index[keep], name="hs6")
+    out = pd.concat([hs6, label.rename("label"), vals], axis=1).reset_index(drop=True)
+    out.attrs.update(years=years, coerced=coerced)
+    return out
+
+
+def load_partner(partner: str, fname: str, base_dir: str = BASE_DIR, years=None) -> pd.DataFrame:
+    """Canonical frame for one "Italy's exports to {partner}" file (every year, or only `years`)."""
+    path = os.path.join(base_dir, fname)
+    df = fix_header_two_rows(read_trademap_table(path))
+
+    hs_col = find_hs_col(df)
+    ycols = partner_value_cols(df, partner, years)
+    if not ycols:
+        raise ValueError(f"No partner year columns detected for {partner} in {fname}")
+    label_col = find_col(df.columns, ["product", "label"])
+
+    out = _canonical(
+        encode_hs6(df[hs_col]), df[label_col] if label_col is not None else None, ycols, df
+    )
+    out.attrs["partner"] = partner
+    return out
+
+
+def load_reporter(path: str, years=None) -> pd.DataFrame:
+    """Canonical frame for a "list of exported products" file (Italy or world)."""
+    df = read_trademap_file(path)
+    code_col = find_col(df.columns, ["product", "code"]) or find_col(df.columns, ["code"])
+    label_col = find_col(df.columns, ["product", "label"])
+    if code_col is None:
+        raise ValueError(f"Product code column not detected in {path}. columns={list(df.columns)}")
+
+    ycols = {header_year(c): c for c in guess_year_value_cols(df, years)}
+    if not ycols:
+        raise ValueError(f"Year export-value columns not detected in {path}")
+
+    return _canonical(
+        encode_hs6(df[code_col]), df[label_col] if label_col is not None else None, ycols, df
+    )
+
+
+def year_columns(frame: pd.DataFrame) -> list:
+    return [c for c in frame.columns if isinstance(c, int)]
@@ -0,0 +1,81 @@
+"""
+Partner metrics for any stability definition, recomputed live.
+
+The pipeline fixes the stable core (RSCA > 0 in >= 3 years) before step1
+to step3 run, so trying another threshold means rebuilding the stable
+file and re-reading every partner file. Here everything that does not
+depend on the definition is laid out once on the RSCA table's HS6 axis:
+
+    ranked    (hs6, years) RSCA per HS6 sorted descending (StableStats)
+    value     (partners, hs6) export value summed over the years
+    listed    (partners, hs6) 1 where the code is listed in the partner file
+    exported  (partners, hs6) 1 where the value is > 0 in some year
+    total     (partners,) export value over all codes
+
+and a (threshold, min years) pair is one column comparison on `ranked`
+(the core mask, as in stable_grid) plus three matrix-vector products:
+step1's value share, the coverage ratio (listed stable HS6) and step3's
+avg-RSCA weighted coverage for every partner. Results are kept per pair.
+"""
+import numpy as np
+import pandas as pd
+
+from .hs6 import lookup
+from .sparse import SparseValues
+from .stable import StableStats, core_mask
+
+
+class ThresholdModel:
+    """Cached RSCA matrix + partner x HS6 matrices; `metrics` is memoized per (threshold, min_years)."""
+
+    def __init__(self, stats: StableStats, values: SparseValues):
+        self.stats = stats
+        self.partners = list(values.partners)
+        self.avg_rsca = np.nan_to_num(stats.avg_rsca)
+        shape = (len(self.partners), len(stats.hs6))
+
+        # sparse entries -> (partner, position on the RSCA axis); codes the RSCA
+        # table does not have can never be stable and only count in the totals
+        rows = values.rows()
+        pos, found = lookup(stats.hs6, values.hs6)
+        on_axis = found[values.code]
+        flat = rows[on_axis] * shape[1] + pos[values.code[on_axis]]
+        self.total = np.bincount(rows, weights=values.value, minlength=shape[0])
+        self.value = np.bincount(
+            flat, weights=values.value[on_axis], minlength=shape[0] * shape[1]
+        ).reshape(shape)
+        self.exported = np.zeros(shape)
+        self.exported.flat[flat[values.value[on_axis] > 0]] = 1.0
+
+        listed_rows = np.repeat(np.arange(shape[0]), np.diff(values.listed_indptr))
+        listed_found = found[values.listed_code]
+        self.listed = np.zeros(shape)
+        self.listed[listed_rows[listed_found], pos[values.listed_code[listed_found]]] = 1.0
+        self._results = {}
+
+    @property
+    def years(self) -> np.ndarray:
+        return self.stats.years
+
+    def core(self, threshold: float, min_years: int) -> np.ndarray:
+        return core_mask(self.stats, threshold, min_years)
+
+    def metrics(self, threshold: float, min_years: int) -> pd.DataFrame:
+        """One row per partner: value_share_stable, coverage_ratio, weighted_rsca_coverage."""
+        key = (round(float(threshold), 6), int(min_years))
+        if key not in self._results:
+            core = self.core(*key).astype(np.float64)
+            weights = self.avg_rsca * core
+            n, total_rsca = core.sum(), weights.sum()
+            value_stable = self.value @ core
+            listed = self.listed @ core
+            weighted = self.exported @ weights
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._results[key] = pd.DataFrame({
+                    "partner": self.partners,
+                    "stable_hs6": int(n),
+                    "value_share_stable": np.where(self.total > 0, value_stable / self.total, 0.0),
+                    "coverage_ratio": listed / n if n else 0.0,
+                    "weighted_rsca_coverage": weighted / total_rsca if total_rsca else 0.0,
+                })
+        return self._results[key]